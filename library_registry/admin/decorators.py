@@ -1,4 +1,4 @@
-from flask import session
+from flask import g, session
 from flask_jwt_extended import verify_jwt_in_request
 from functools import wraps
 from library_registry.problem_details import (
@@ -9,8 +9,15 @@ from library_registry.problem_details import (
 def check_logged_in(fn):
     @wraps(fn)
     def decorated(*args, **kwargs):
-        if session.get("username") or verify_jwt_in_request(optional=True):
+        if _is_logged_in():
             # 401 Unauthorized, username or password is incorrect
             return fn(*args, **kwargs)
         return INVALID_CREDENTIALS.response
     return decorated
+
+
+def _is_logged_in():
+    """Check the session and JWT for a logged-in admin, at most once per request."""
+    if "admin_logged_in" not in g:
+        g.admin_logged_in = bool(session.get("username") or verify_jwt_in_request(optional=True))
+    return g.admin_logged_in
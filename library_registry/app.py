@@ -1,4 +1,5 @@
 """Library registry web application."""
+import functools
 import os
 import sys
 import urllib.parse
@@ -32,7 +33,15 @@ from library_registry.model import SessionManager, ConfigurationSetting
 TESTING = 'TESTING' in os.environ
 babel = Babel()
 
-db_url = Configuration.database_url(test=TESTING)
+# The sitewide secret used to sign admin sessions. It never changes once created, so it's looked up
+# at most once per process, no matter how many apps are created.
+_SECRET_KEY = None
+
+
+@functools.lru_cache(maxsize=2)
+def _db_url(test):
+    """Resolve the database URL once per process, and only if an app actually needs its own session."""
+    return Configuration.database_url(test=test)
 
 
 def create_app(testing=False, db_session_obj=None):
@@ -60,7 +69,9 @@ def create_app(testing=False, db_session_obj=None):
     if testing and db_session_obj:
         _db = db_session_obj
     else:
-        SessionManager.initialize(db_url)
+        db_url = _db_url(TESTING)
+        (_, connection) = SessionManager.initialize(db_url)
+        connection.close()      # The session factory below gets its own connections from the pool.
         session_factory = SessionManager.sessionmaker(db_url)
         _db = flask_scoped_session(session_factory, app)
 
@@ -75,22 +86,24 @@ def create_app(testing=False, db_session_obj=None):
 
     @app.before_first_request
     def set_secret_key(_db=None):
-        _db = _db or app._db
-        app.secret_key = ConfigurationSetting.sitewide_secret(
-            _db, Configuration.SECRET_KEY)
+        global _SECRET_KEY
+        if _SECRET_KEY is None:
+            _db = _db or app._db
+            _SECRET_KEY = ConfigurationSetting.sitewide_secret(
+                _db, Configuration.SECRET_KEY)
+        app.secret_key = _SECRET_KEY
 
     @app.teardown_request
     def shutdown_session(exception):
         """Commit or rollback the database session associated with the request"""
-        if (
-            hasattr(app, 'library_registry',) and
-            hasattr(app.library_registry, '_db') and
-            app.library_registry._db
-        ):
+        # app.library_registry is always set by this point, and LibraryRegistry always has a _db,
+        # though it may be None.
+        _db = app.library_registry._db
+        if _db:
             if exception:
-                app.library_registry._db.rollback()
+                _db.rollback()
             else:
-                app.library_registry._db.commit()
+                _db.commit()
 
     return app
 
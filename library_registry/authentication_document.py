@@ -1,14 +1,38 @@
+import copy
+import hashlib
 import json
 from collections import defaultdict
 
 from flask_babel import lazy_gettext as lgt
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
 from sqlalchemy.orm.session import Session
 
 from library_registry.constants import (AUTHENTICATION_DOCUMENT_MEDIA_TYPE, OPDS_CATALOG_MEDIA_TYPE)
-from library_registry.model_helpers import get_one_or_create
-from library_registry.model import (Audience, CollectionSummary, Place, ServiceArea)
+from library_registry.model import (Audience, CollectionSummary, Place, PlaceAlias, ServiceArea)
 from library_registry.problem_details import INVALID_INTEGRATION_DOCUMENT
+from library_registry.util.cache import TTLCache
+
+try:
+    import orjson
+except ImportError:     # orjson is an optional speedup; fall back to the standard library.
+    orjson = None
+
+# Libraries tend to re-submit the same coverage objects over and over, and resolving a coverage object into
+# Places can take several queries per place. Keep the outcome around, keyed by a digest of the coverage object.
+# Any change to Places or their aliases throws the whole cache away; the TTL bounds how long a change made by
+# another process can go unnoticed.
+_RESOLVED_COVERAGE = TTLCache(maxsize=1024, ttl=600)
+
+
+def _forget_resolved_coverage(mapper, connection, target):
+    _RESOLVED_COVERAGE.clear()
+
+
+for _model in (Place, PlaceAlias):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _forget_resolved_coverage)
 
 
 class AuthenticationDocument:
@@ -23,16 +47,23 @@ class AuthenticationDocument:
     COVERAGE_EVERYWHERE         = "everywhere"                                          # noqa: E221
     PUBLIC_AUDIENCE             = 'public'                                              # noqa: E221
 
-    AUDIENCES = [
+    # No legitimate authentication document comes anywhere near this size, even with a logo embedded as a
+    # data: URL. Anything bigger is refused before it's parsed.
+    MAX_DOCUMENT_SIZE           = 1024 * 1024                                           # noqa: E221
+
+    # Where _default_nation() keeps the default nation's ID in a database session's info dictionary.
+    DEFAULT_NATION_ID_KEY       = 'authentication_document.default_nation_id'           # noqa: E221
+
+    AUDIENCES = frozenset([
         PUBLIC_AUDIENCE,
         'educational-primary',
         'educational-secondary',
         'research',
         'print-disability',
         'other',
-    ]
+    ])
 
-    SIMPLYE_COLOR_SCHEMES = [       # The list of color schemes supported by SimplyE.
+    SIMPLYE_COLOR_SCHEMES = frozenset([     # The color schemes supported by SimplyE.
         "red",
         "blue",
         "gray",
@@ -40,7 +71,7 @@ class AuthenticationDocument:
         "green",
         "teal",
         "purple",
-    ]
+    ])
 
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
     def __init__(self, _db, id, title, authentication, service_description,
@@ -49,6 +80,9 @@ class AuthenticationDocument:
         self.id = id
         self.title = title
         self.authentication = authentication
+        self.authentication_flows = tuple(     # All valid authentication flows in this document.
+            flow for flow in (authentication or []) if isinstance(flow, dict)
+        )
         self.service_description = service_description
         self.color_scheme = color_scheme
         self.collection_size = collection_size
@@ -60,6 +94,7 @@ class AuthenticationDocument:
         )
 
         self.links = links
+        self._links_by_rel = self._index_links(links)
         self.website = self.extract_link(rel="alternate", require_type="text/html")
         self.online_registration = self.has_link(rel="register")
         self.root = self.extract_link(rel="start", prefer_type=OPDS_CATALOG_MEDIA_TYPE)
@@ -75,12 +110,9 @@ class AuthenticationDocument:
             else:
                 self.logo_link = logo
 
-        self.anonymous_access = False
-
-        for flow in self.authentication_flows:
-            if flow.get('type') == self.ANONYMOUS_ACCESS_REL:
-                self.anonymous_access = True
-                break
+        self.anonymous_access = any(
+            flow.get('type') == self.ANONYMOUS_ACCESS_REL for flow in self.authentication_flows
+        )
 
     def extract_link(self, rel, require_type=None, prefer_type=None):
         """
@@ -92,7 +124,11 @@ class AuthenticationDocument:
         :param require_type: The link must have this as its type.
         :param prefer_type: A link with this type is better than a link of some other type.
         """
-        return self._extract_link(self.links, rel, require_type, prefer_type)
+        return self._best_link(self._links_by_rel.get(rel, ()), require_type, prefer_type)
+
+    def links_with_rel(self, rel):
+        """Return every link in the main authentication document with the given link relation."""
+        return self._links_by_rel.get(rel, [])
 
     def has_link(self, rel):
         """
@@ -103,7 +139,7 @@ class AuthenticationDocument:
         :rel: The link must have this link relation.
         :return: True if there is a link with the link relation in the document, False otherwise.
         """
-        if self._extract_link(self.links, rel):
+        if rel in self._links_by_rel:
             return True
 
         # We couldn't find a matching link in the main set of links, but maybe there's a matching
@@ -149,14 +185,6 @@ class AuthenticationDocument:
     ##### Private Methods ####################################################  # noqa: E266
 
     ##### Properties and Getters/Setters #####################################  # noqa: E266
-    @property
-    def authentication_flows(self):
-        """Return all valid authentication flows in this document."""
-        for i in self.authentication:
-            if not isinstance(i, dict):
-                continue    # Not a valid authentication flow.
-
-            yield i
 
     ##### Class Methods ######################################################  # noqa: E266
     @classmethod
@@ -203,7 +231,7 @@ class AuthenticationDocument:
         elif not isinstance(coverage, dict):
             # The coverage is not in { nation: place } format.
             # Convert it into that format using the default nation.
-            default_nation = place_class.default_nation(_db)
+            default_nation = cls._default_nation(_db, place_class)
 
             if default_nation:
                 coverage = {default_nation.abbreviated_name: coverage}
@@ -213,6 +241,16 @@ class AuthenticationDocument:
                 unknown["??"] = coverage
                 coverage = {}   # Do no more processing
 
+        # Only real Place lookups are worth caching; a mock place_class in a unit test may answer differently.
+        cache_key = None
+        if coverage and place_class is Place:
+            cache_key = hashlib.blake2b(
+                json.dumps(coverage, sort_keys=True).encode("utf8"), digest_size=16
+            ).digest()
+            cached = cls._cached_coverage(_db, cache_key)
+            if cached:
+                return cached
+
         for nation, places in list(coverage.items()):
             try:
                 nation_obj = place_class.lookup_one_by_name(_db, nation, place_type=Place.NATION)
@@ -224,27 +262,42 @@ class AuthenticationDocument:
                         # This is invalid -- you're supposed to always pass in a list -- but we can support it.
                         places = [places]
 
-                    for place in places:
-                        try:
-                            place_obj = nation_obj.lookup_inside(place)
+                    (found, ambiguous_names) = nation_obj.lookup_inside_many(places)
 
-                            if place_obj:                       # We found it.
-                                place_objs.append(place_obj)
-                            else:                               # We couldn't find any place with this name.
-                                unknown[nation].append(place)
-                        except MultipleResultsFound:
-                            ambiguous[nation].append(place)     # The place was ambiguously named.
+                    for place in places:
+                        if place in ambiguous_names:            # The place was ambiguously named.
+                            ambiguous[nation].append(place)
+                        elif found.get(place):                  # We found it.
+                            place_objs.append(found[place])
+                        else:                                   # We couldn't find any place with this name.
+                            unknown[nation].append(place)
 
             except MultipleResultsFound:
                 ambiguous[nation] = places                      # A nation was ambiguously named; not very likely.
             except NoResultFound:
                 unknown[nation] = places                        # Unrecognized nation or we have no geography for it.
 
+        if cache_key:
+            _RESOLVED_COVERAGE.set(
+                cache_key, ([p.id for p in place_objs], copy.deepcopy(unknown), copy.deepcopy(ambiguous))
+            )
+
         return place_objs, unknown, ambiguous
 
     @classmethod
     def from_string(cls, _db, s, place_class=Place):
-        data = json.loads(s)
+        """
+        Parse an Authentication For OPDS document from a JSON string or bytestring.
+
+        Uses orjson when it's installed, since every incoming document passes through here. orjson's decode
+        errors are subclasses of json.JSONDecodeError, so callers see the same exceptions either way.
+
+        :raise ValueError: If the document is larger than MAX_DOCUMENT_SIZE, or isn't valid JSON.
+        """
+        if len(s) > cls.MAX_DOCUMENT_SIZE:
+            raise ValueError(f"Authentication document is too large: {len(s)} > {cls.MAX_DOCUMENT_SIZE}")
+
+        data = orjson.loads(s) if orjson else json.loads(s)
         return cls.from_dict(_db, data, place_class)
 
     @classmethod
@@ -304,15 +357,57 @@ class AuthenticationDocument:
         library.service_areas = service_areas
 
     ##### Private Class Methods ##############################################  # noqa: E266
+    @classmethod
+    def _default_nation(cls, _db, place_class=Place):
+        """
+        Look up the registry's default nation, at most once per database session.
+
+        Only the ID is remembered, in the session's info dictionary, so a rolled-back transaction can't leave a
+        stale Place object behind. Getting the Place back by ID is normally an identity map hit.
+        """
+        if place_class is not Place:
+            return place_class.default_nation(_db)     # Don't memoize a mock.
+
+        if cls.DEFAULT_NATION_ID_KEY not in _db.info:
+            default_nation = place_class.default_nation(_db)
+            _db.info[cls.DEFAULT_NATION_ID_KEY] = default_nation.id if default_nation else None
+
+        default_nation_id = _db.info[cls.DEFAULT_NATION_ID_KEY]
+        if default_nation_id is None:
+            return None
+
+        return _db.query(Place).get(default_nation_id)
+
+    @classmethod
+    def _cached_coverage(cls, _db, cache_key):
+        """
+        Rebuild the output of parse_coverage() from a cached result, with a single query for the Places.
+
+        :return: A 3-tuple (places, unknown, ambiguous), or None if there's no usable cached result.
+        """
+        cached = _RESOLVED_COVERAGE.get(cache_key)
+        if not cached:
+            return None
+
+        (place_ids, unknown, ambiguous) = cached
+        places_by_id = {}
+        if place_ids:
+            places_by_id = {p.id: p for p in _db.query(Place).filter(Place.id.in_(place_ids))}
+
+        if len(places_by_id) != len(set(place_ids)):
+            return None     # A Place went away since this was cached.
+
+        return [places_by_id[x] for x in place_ids], copy.deepcopy(unknown), copy.deepcopy(ambiguous)
+
     @classmethod
     def _update_collection_size(self, library, sizes):
-        if isinstance(sizes, str) or isinstance(sizes, int):
+        if isinstance(sizes, dict):
+            pass                    # Collection sizes broken down by language; the usual case.
+        elif isinstance(sizes, (str, int)):
             sizes = {None: sizes}   # A single collection with no known language.
-
-        if sizes is None:
+        elif sizes is None:
             sizes = {}              # No collections are specified.
-
-        if not isinstance(sizes, dict):
+        else:
             return INVALID_INTEGRATION_DOCUMENT.detailed(
                 lgt("'collection_size' must be a number or an object mapping language codes to numbers")
             )
@@ -360,11 +455,29 @@ class AuthenticationDocument:
                 msgs.append(str(lgt(f"The following service area was ambiguous: {json.dumps(ambiguous)}.")))
             return INVALID_INTEGRATION_DOCUMENT.detailed(" ".join(msgs))
 
-        for place in places:
-            (service_area, _) = get_one_or_create(
-                _db, ServiceArea, library_id=library.id, place_id=place.id, type=type
+        if not places:
+            return
+
+        if library.id is None:
+            _db.flush()     # The Library needs an ID before any ServiceArea can point to it.
+
+        # Find the ServiceAreas that already exist, then create all the missing ones with a single statement.
+        place_ids = [place.id for place in places]
+        qu = _db.query(ServiceArea).filter(ServiceArea.library_id == library.id, ServiceArea.type == type)
+        areas_by_place_id = {area.place_id: area for area in qu.filter(ServiceArea.place_id.in_(place_ids))}
+
+        missing = set(place_ids) - set(areas_by_place_id)
+        if missing:
+            _db.execute(
+                insert(ServiceArea.__table__).values(
+                    [dict(library_id=library.id, place_id=place_id, type=type) for place_id in missing]
+                ).on_conflict_do_nothing()
             )
-            service_areas.append(service_area)
+            areas_by_place_id.update(
+                (area.place_id, area) for area in qu.filter(ServiceArea.place_id.in_(missing))
+            )
+
+        service_areas.extend(areas_by_place_id[place_id] for place_id in place_ids)
 
     @classmethod
     def _update_audiences(self, library, audiences):
@@ -380,39 +493,57 @@ class AuthenticationDocument:
         filtered_audiences = set()      # Unrecognized audiences become Audience.OTHER.
 
         for audience in audiences:
-            if audience in Audience.KNOWN_AUDIENCES:
+            if isinstance(audience, str) and audience in Audience.KNOWN_AUDIENCES:
                 filtered_audiences.add(audience)
             else:
                 filtered_audiences.add(Audience.OTHER)
 
-        audiences = filtered_audiences
+        if filtered_audiences == {audience.name for audience in library.audiences}:
+            return      # Nothing has changed.
 
-        audience_objs = []
         _db = Session.object_session(library)
+        library.audiences = Audience.lookup_many(_db, list(filtered_audiences))
 
-        for audience in audiences:
-            audience_obj = Audience.lookup(_db, audience)
-            audience_objs.append(audience_obj)
+    @classmethod
+    def _extract_link(cls, links, rel, require_type=None, prefer_type=None):
+        if not isinstance(links, list):
+            links = []      # There are no links, or the links object is invalid; ignore it.
 
-        library.audiences = audience_objs
+        return cls._best_link([link for link in links if rel == link.get('rel')], require_type, prefer_type)
 
     @classmethod
-    def _extract_link(cls, links, rel, require_type=None, prefer_type=None):
+    def _index_links(cls, links):
+        """
+        Group a list of links by their link relations, so each relation can be looked up directly.
+
+        Only links whose rel is a single string are indexed, since those are the only links a lookup by
+        rel has ever matched.
+        """
+        links_by_rel = defaultdict(list)
+
+        if isinstance(links, list):
+            for link in links:
+                if not isinstance(link, dict):
+                    continue
+                rel = link.get('rel')
+                if isinstance(rel, str):
+                    links_by_rel[rel].append(link)
+
+        return dict(links_by_rel)
+
+    @classmethod
+    def _best_link(cls, links, require_type=None, prefer_type=None):
+        """
+        Choose the best of a list of links which all have the link relation being looked for.
+
+        See extract_link() for the meaning of require_type and prefer_type.
+        """
         if require_type and prefer_type:
             raise ValueError("At most one of require_type and prefer_type may be specified.")
 
-        if not links:
-            return None     # There are no links, period.
-
         good_enough = None
 
-        if not isinstance(links, list):
-            return          # Invalid links object; ignore it.
-
         for link in links:
-            if rel != link.get('rel'):
-                continue
-
             if not require_type and not prefer_type:
                 return link     # Any link with this relation will work. Return the first one we see.
 
@@ -1,9 +1,17 @@
+import binascii
+import datetime
+import hashlib
 import re
+import threading
+import xml.etree.ElementTree as ET
+from io import BytesIO
 
 import requests
 from flask import Response, request
+from lxml import etree
 
 import library_registry.drm.templates.adobe_xml_templates as t
+from library_registry.util.cache import TTLCache
 from library_registry.util.short_client_token import ShortClientTokenDecoder
 from library_registry.util.string_helpers import base64
 from library_registry.util.xmlparser import XMLParser
@@ -16,6 +24,9 @@ class AdobeVendorIDController:
     """
     ##### Class Constants ####################################################  # noqa: E266
 
+    XML_HEADERS = {"Content-Type": "application/xml"}
+    STATUS_HEADERS = {"Content-Type": "text/plain"}
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
     def __init__(self, _db, vendor_id, node_value, delegates=None):
@@ -33,15 +44,18 @@ class AdobeVendorIDController:
         self.model = AdobeVendorIDModel(self._db, node_value, delegates)
 
     def signin_handler(self):
-        """Process an incoming signInRequest document."""
-        __transaction = self._db.begin_nested()
+        """
+        Process an incoming signInRequest document.
+
+        No SAVEPOINT is opened here: most signins only read, and the one place a signin writes,
+        creating a DelegatedPatronIdentifier, already runs inside its own nested transaction.
+        """
         output = self.request_handler.handle_signin_request(
             request.data.decode('utf8'),
             self.model.standard_lookup,
             self.model.authdata_lookup
         )
-        __transaction.commit()
-        return Response(output, 200, {"Content-Type": "application/xml"})
+        return Response(output, 200, self.XML_HEADERS)
 
     def userinfo_handler(self):
         """Process an incoming userInfoRequest document."""
@@ -49,10 +63,10 @@ class AdobeVendorIDController:
             request.data.decode('utf8'),
             self.model.urn_to_label
         )
-        return Response(output, 200, {"Content-Type": "application/xml"})
+        return Response(output, 200, self.XML_HEADERS)
 
     def status_handler(self):
-        return Response("UP", 200, {"Content-Type": "text/plain"})
+        return Response("UP", 200, self.STATUS_HEADERS)
 
     ##### Private Methods ####################################################  # noqa: E266
 
@@ -67,30 +81,97 @@ class AdobeRequestParser(XMLParser):
     ##### Class Constants ####################################################  # noqa: E266
 
     NAMESPACES = {"adept": "http://ns.adobe.com/adept"}
+    ADEPT_PREFIX = "{http://ns.adobe.com/adept}"
+
+    REQUEST_TAG = None      # Clark-notation name of the root tag, e.g. '{ns}signInRequest'
+    FIELDS = ()             # Local names of the child tags we pull values from
+
+    # lxml parsers aren't thread-safe, so each thread gets its own, created on first use.
+    _lxml_parsers = threading.local()
 
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
+    def __init_subclass__(cls, **kwargs):
+        """Compile the XPath expression for each of a parser's fields once, when the class is defined."""
+        super().__init_subclass__(**kwargs)
+        cls._XPATHS = {key: etree.XPath('adept:' + key, namespaces=cls.NAMESPACES) for key in cls.FIELDS}
+
     def process(self, data):
-        requests = list(self.process_all(data, self.REQUEST_XPATH, self.NAMESPACES))
+        requests = list(self.process_all(data, self.REQUEST_XPATH, self.NAMESPACES, parser=self._lxml_parser()))
 
         if not requests:
             return None
 
         return requests[0]  # Return only the first request tag, even if there are multiple
 
+    def process_fast(self, data):
+        """
+        Extract the request fields in a single pass over the document's parse events.
+
+        Adobe request documents are tiny and have a fixed shape, so there's no need to build an lxml
+        tree and evaluate XPath against it. If the document isn't well-formed we fall back to process(),
+        so that the caller sees the same error it always has.
+
+        Adobe never sends a DTD, so a document with one also goes to process(), whose parser won't
+        expand entities or fetch anything over the network.
+        """
+        raw = data.encode('utf8') if isinstance(data, str) else data
+        if b"<!DOCTYPE" in raw:
+            return self.process(data)
+
+        try:
+            (root, values) = self._scan(raw)
+        except ET.ParseError:
+            return self.process(data)
+
+        if root is None or root.tag != self.REQUEST_TAG:
+            return None
+
+        return self._build(root.attrib.get('method'), values)
+
+    def process_one(self, tag, namespaces):
+        values = {key: self._text(tag, key, namespaces) for key in self.FIELDS}
+        return self._build(tag.attrib.get('method'), values)
+
     ##### Private Methods ####################################################  # noqa: E266
 
-    def _add(self, d, tag, key, namespaces, transform=None):
-        v = self._xpath1(tag, 'adept:' + key, namespaces)
+    def _scan(self, data):
+        """
+        Walk the parse events for a document, collecting the text of the root tag's children.
+
+        :return: A 2-tuple (root element, dict of field name to stripped text)
+        """
+        root = None
+        values = {}
+        depth = 0
+
+        for (event, elem) in ET.iterparse(BytesIO(data), events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = elem
+                continue
+
+            depth -= 1
+            if depth == 1:
+                if elem.tag.startswith(self.ADEPT_PREFIX):
+                    key = elem.tag[len(self.ADEPT_PREFIX):]
+                    if key in self.FIELDS and key not in values:
+                        values[key] = elem.text.strip() if elem.text is not None else None
+                elem.clear()
+
+        return (root, {key: values.get(key) for key in self.FIELDS})
+
+    def _text(self, tag, key, namespaces):
+        nodes = self._XPATHS[key](tag)
+        if not nodes:
+            return None
 
+        v = nodes[0].text
         if v is not None:
-            v = v.text
-            if v is not None:
-                v = v.strip()
-                if callable(transform):
-                    v = transform(v)
+            v = v.strip()
 
-        d[key] = v
+        return v
 
     ##### Properties and Getters/Setters #####################################  # noqa: E266
 
@@ -98,35 +179,78 @@ class AdobeRequestParser(XMLParser):
 
     ##### Private Class Methods ##############################################  # noqa: E266
 
+    @classmethod
+    def _lxml_parser(cls):
+        """
+        Return this thread's lxml parser, configured for documents posted by strangers: no entity
+        expansion, no network access, no huge trees, and no ID bookkeeping.
+        """
+        parser = getattr(cls._lxml_parsers, 'parser', None)
+
+        if parser is None:
+            parser = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=False, collect_ids=False)
+            cls._lxml_parsers.parser = parser
+
+        return parser
+
 
 class AdobeSignInRequestParser(AdobeRequestParser):
     ##### Class Constants ####################################################  # noqa: E266
 
     REQUEST_XPATH = "/adept:signInRequest"
+    REQUEST_TAG = AdobeRequestParser.ADEPT_PREFIX + "signInRequest"
+    FIELDS = ('username', 'password', 'authData')
     STANDARD = 'standard'
     AUTH_DATA = 'authData'
 
+    # The document Adobe clients send for an authData signin, exactly as they send it. Only base64
+    # characters are allowed in the token, so a document that matches can't contain anything (entities,
+    # CDATA, comments) which an XML parser would read differently.
+    AUTHDATA_REQUEST_RE = re.compile(
+        r'\s*<signInRequest method="authData" xmlns="http://ns.adobe.com/adept">\s*'
+        r'<authData>([A-Za-z0-9+/=\s]+)</authData>\s*'
+        r'</signInRequest>\s*'
+    )
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
-    def process_one(self, tag, namespaces):
-        method = tag.attrib.get('method')
+    def process_authdata(self, data):
+        """
+        Handle the common case of an authData signin without parsing any XML.
+
+        :return: The same dict process_fast() would return, or None if data isn't a canonical
+            authData signin document and needs to go through the parser.
+        """
+        match = self.AUTHDATA_REQUEST_RE.fullmatch(data) if isinstance(data, str) else None
+        if not match:
+            return None
 
+        return {'method': self.AUTH_DATA, self.AUTH_DATA: self._decode_authdata(match.group(1))}
+
+    ##### Private Methods ####################################################  # noqa: E266
+
+    def _build(self, method, values):
         if not method:
             raise ValueError("No signin method specified")
 
         data = dict(method=method)
 
         if method == self.STANDARD:
-            self._add(data, tag, 'username', namespaces)
-            self._add(data, tag, 'password', namespaces)
+            data['username'] = values['username']
+            data['password'] = values['password']
         elif method == self.AUTH_DATA:
-            self._add(data, tag, self.AUTH_DATA, namespaces, base64.b64decode)
+            authdata = values[self.AUTH_DATA]
+            if authdata is not None:
+                authdata = self._decode_authdata(authdata)
+            data[self.AUTH_DATA] = authdata
         else:
             raise ValueError(f"Unknown signin method: {method}")
 
         return data
 
-    ##### Private Methods ####################################################  # noqa: E266
+    def _decode_authdata(self, authdata):
+        # a2b_base64 skips any whitespace itself, and goes straight from the element text to bytes.
+        return binascii.a2b_base64(authdata.encode("utf8")).decode("utf8")
 
     ##### Properties and Getters/Setters #####################################  # noqa: E266
 
@@ -139,17 +263,16 @@ class AdobeAccountInfoRequestParser(AdobeRequestParser):
     ##### Class Constants ####################################################  # noqa: E266
 
     REQUEST_XPATH = "/adept:accountInfoRequest"
+    REQUEST_TAG = AdobeRequestParser.ADEPT_PREFIX + "accountInfoRequest"
+    FIELDS = ('user',)
 
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
-    def process_one(self, tag, namespaces):
-        method = tag.attrib.get('method')
-        data = dict(method=method)
-        self._add(data, tag, 'user', namespaces)
-        return data
-
     ##### Private Methods ####################################################  # noqa: E266
 
+    def _build(self, method, values):
+        return dict(method=method, user=values['user'])
+
     ##### Properties and Getters/Setters #####################################  # noqa: E266
 
     ##### Class Methods ######################################################  # noqa: E266
@@ -158,7 +281,11 @@ class AdobeAccountInfoRequestParser(AdobeRequestParser):
 
 
 class AdobeVendorIDRequestHandler:
-    """Standalone class that can be tested without bringing in Flask or the database schema"""
+    """
+    Standalone class that can be tested without bringing in Flask or the database schema
+
+    Response documents are built and returned as UTF-8 encoded bytes, ready to be sent as they are.
+    """
 
     ##### Class Constants ####################################################  # noqa: E266
     AUTH_ERROR_TYPE         = "AUTH"                                        # noqa: E221
@@ -171,15 +298,24 @@ class AdobeVendorIDRequestHandler:
     ACCOUNT_INFO_RESPONSE_TEMPLATE  = t.ACCOUNT_INFO_RESPONSE_TEMPLATE      # noqa: E221
     ERROR_RESPONSE_TEMPLATE         = t.ERROR_RESPONSE_TEMPLATE             # noqa: E221
 
+    # The parsers hold no per-request state, so every request can share the same instances.
+    SIGN_IN_PARSER                  = AdobeSignInRequestParser()            # noqa: E221
+    ACCOUNT_INFO_PARSER             = AdobeAccountInfoRequestParser()       # noqa: E221
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
     def __init__(self, vendor_id):
         self.vendor_id = vendor_id
 
+        # Only the error type and message vary from one error document to the next, so the vendor ID
+        # can be bound into the template once, here.
+        (prefix, self._error_suffix) = self.ERROR_RESPONSE_TEMPLATE.split(b"%(type)s %(message)s")
+        self._error_prefix = prefix % {b"vendor_id": str(vendor_id).encode("utf8")}
+
     def handle_signin_request(self, data, standard_lookup, authdata_lookup):
-        parser = AdobeSignInRequestParser()
+        parser = self.SIGN_IN_PARSER
 
         try:
-            data = parser.process(data)
+            data = parser.process_authdata(data) or parser.process_fast(data)
         except Exception as e:
             return self.error_document(self.AUTH_ERROR_TYPE, str(e))
 
@@ -202,14 +338,14 @@ class AdobeVendorIDRequestHandler:
         if user_id is None:
             return self.error_document(self.AUTH_ERROR_TYPE, failure)
         else:
-            return self.SIGN_IN_RESPONSE_TEMPLATE % {"user": user_id, "label": label}
+            return self.SIGN_IN_RESPONSE_TEMPLATE % {b"user": user_id.encode("utf8"), b"label": label.encode("utf8")}
 
     def handle_accountinfo_request(self, data, urn_to_label):
-        parser = AdobeAccountInfoRequestParser()
+        parser = self.ACCOUNT_INFO_PARSER
         label = None
 
         try:
-            data = parser.process(data)
+            data = parser.process_fast(data)
             if not data:
                 return self.error_document(self.ACCOUNT_INFO_ERROR_TYPE, "Request document in wrong format.")
 
@@ -222,12 +358,12 @@ class AdobeVendorIDRequestHandler:
             return self.error_document(self.ACCOUNT_INFO_ERROR_TYPE, str(e))
 
         if label:
-            return self.ACCOUNT_INFO_RESPONSE_TEMPLATE % dict(label=label)
+            return self.ACCOUNT_INFO_RESPONSE_TEMPLATE % {b"label": label.encode("utf8")}
         else:
             return self.error_document(self.ACCOUNT_INFO_ERROR_TYPE, self.URN_LOOKUP_FAILURE % data['user'])
 
     def error_document(self, type, message):
-        return self.ERROR_RESPONSE_TEMPLATE % {"vendor_id": self.vendor_id, "type": type, "message": message}
+        return b"%s%s %s%s" % (self._error_prefix, type.encode("utf8"), message.encode("utf8"), self._error_suffix)
 
     ##### Private Methods ####################################################  # noqa: E266
 
@@ -242,10 +378,16 @@ class AdobeVendorIDModel:
     """Implement Adobe Vendor ID within the library registry's database model"""
     ##### Class Constants ####################################################  # noqa: E266
 
+    # Adobe clients sign in again and again with the same token, so we remember the result of each
+    # successful lookup until the token expires, or for LOOKUP_CACHE_TTL seconds, whichever is sooner.
+    LOOKUP_CACHE_SIZE = 50000
+    LOOKUP_CACHE_TTL = 300
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
     def __init__(self, _db, node_value, delegates):
         self._db = _db
+        self.lookup_cache = TTLCache(self.LOOKUP_CACHE_SIZE, self.LOOKUP_CACHE_TTL)
         delegate_objs = []
 
         for i in delegates:
@@ -265,6 +407,11 @@ class AdobeVendorIDModel:
         username = authorization_data.get('username')
         password = authorization_data.get('password')
 
+        token = f"{username}|{password}"
+        cached = self.lookup_cache.get(self._cache_key(token))
+        if cached:
+            return cached
+
         try:
             delegated_patron_identifier = self.short_client_token_decoder.decode_two_part(
                 self._db, username, password
@@ -273,7 +420,7 @@ class AdobeVendorIDModel:
             delegated_patron_identifier = None
 
         if delegated_patron_identifier:
-            return self.account_id_and_label(delegated_patron_identifier)
+            return self._cache_result(token, self.account_id_and_label(delegated_patron_identifier))
         else:
             for delegate in self.short_client_token_decoder.delegates:
                 try:
@@ -290,13 +437,18 @@ class AdobeVendorIDModel:
         human-readable label. Create a DelegatedPatronIdentifier to hold the Adobe Account ID
         if necessary.
         """
+        if authdata:
+            cached = self.lookup_cache.get(self._cache_key(authdata))
+            if cached:
+                return cached
+
         try:
             delegated_patron_identifier = self.short_client_token_decoder.decode(self._db, authdata)
         except ValueError:
             delegated_patron_identifier = None
 
         if delegated_patron_identifier:
-            return self.account_id_and_label(delegated_patron_identifier)
+            return self._cache_result(authdata, self.account_id_and_label(delegated_patron_identifier))
         else:
             for delegate in self.short_client_token_decoder.delegates:
                 try:
@@ -312,8 +464,9 @@ class AdobeVendorIDModel:
         if not delegated_patron_identifier:
             return (None, None)
 
+        # Same label as urn_to_label(), built inline since this runs on every successful signin.
         urn = delegated_patron_identifier.delegated_identifier
-        return (urn, self.urn_to_label(urn))
+        return (urn, f"Delegated account ID {urn}")
 
     def urn_to_label(self, urn):
         """We have no information about patrons, so labels are sparse."""
@@ -321,6 +474,22 @@ class AdobeVendorIDModel:
 
     ##### Private Methods ####################################################  # noqa: E266
 
+    def _cache_key(self, token):
+        """Hash a token down to a fixed-width key, so the cache doesn't hold on to the tokens themselves."""
+        if isinstance(token, str):
+            token = token.encode("utf8")
+
+        return hashlib.blake2b(token, digest_size=16).digest()
+
+    def _cache_result(self, token, result):
+        """Remember the result of a successful token lookup for as long as the token is valid."""
+        expiration = self.short_client_token_decoder.expiration(token)
+        if expiration:
+            ttl = (expiration - datetime.datetime.utcnow()).total_seconds()
+            self.lookup_cache.set(self._cache_key(token), result, ttl)
+
+        return result
+
     ##### Properties and Getters/Setters #####################################  # noqa: E266
 
     ##### Class Methods ######################################################  # noqa: E266
@@ -382,7 +551,7 @@ class AdobeVendorIDClient:
     def status(self):
         """Is the server up and running?"""
         response = requests.get(self.status_url)
-        content = response.content
+        content = response.text
         self.handle_error(response.status_code, content)
         if content == 'UP':
             return True
@@ -393,7 +562,7 @@ class AdobeVendorIDClient:
 
         :param: If signin is successful, a 2-tuple (account identifier, label).
         """
-        body = self.SIGNIN_AUTHDATA_BODY % base64.encodestring(authdata)
+        body = self.SIGNIN_AUTHDATA_BODY % base64.b64encode(authdata)
         response = requests.post(self.signin_url, data=body)
         return self._process_sign_in_result(response)
 
@@ -407,7 +576,7 @@ class AdobeVendorIDClient:
         """Turn a user identifier into a label."""
         body = self.USER_INFO_BODY % urn
         response = requests.post(self.accountinfo_url, data=body)
-        content = response.content
+        content = response.text
         self.handle_error(response.status_code, content)
         label = self.extract_label(content)
         if not label:
@@ -438,7 +607,7 @@ class AdobeVendorIDClient:
         return match.groups()[0]
 
     def _process_sign_in_result(self, response):
-        content = response.content
+        content = response.text
         self.handle_error(response.status_code, content)
         identifier = self.extract_user_identifier(content)
         label = self.extract_label(content)
@@ -1,3 +1,5 @@
+from functools import wraps
+
 from flask import Blueprint, Response, current_app
 
 from library_registry.decorators import (
@@ -8,27 +10,37 @@ drm = Blueprint(
     'drm', __name__,
     template_folder='templates')
 
+
+def uses_adobe_vendor_id(f):
+    """
+    Passes the app's AdobeVendorIDController to the view as its first argument, or responds
+    with a 404 if this registry doesn't have an Adobe Vendor ID configured.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        vendor_id = current_app.library_registry.adobe_vendor_id
+        if not vendor_id:
+            return Response("", 404)
+
+        return f(vendor_id, *args, **kwargs)
+
+    return decorated
+
 # Adobe Vendor ID implementation
 @drm.route('/AdobeAuth/SignIn', methods=['POST'])
 @returns_problem_detail
-def adobe_vendor_id_signin():
-    if current_app.library_registry.adobe_vendor_id:
-        return current_app.library_registry.adobe_vendor_id.signin_handler()
-    else:
-        return Response("", 404)
+@uses_adobe_vendor_id
+def adobe_vendor_id_signin(vendor_id):
+    return vendor_id.signin_handler()
 
 @drm.route('/AdobeAuth/AccountInfo', methods=['POST'])
 @returns_problem_detail
-def adobe_vendor_id_accountinfo():
-    if current_app.library_registry.adobe_vendor_id:
-        return current_app.library_registry.adobe_vendor_id.userinfo_handler()
-    else:
-        return Response("", 404)
+@uses_adobe_vendor_id
+def adobe_vendor_id_accountinfo(vendor_id):
+    return vendor_id.userinfo_handler()
 
 @drm.route('/AdobeAuth/Status')
 @returns_problem_detail
-def adobe_vendor_id_status():
-    if current_app.library_registry.adobe_vendor_id:
-        return current_app.library_registry.adobe_vendor_id.status_handler()
-    else:
-        return Response("", 404)
\ No newline at end of file
+@uses_adobe_vendor_id
+def adobe_vendor_id_status(vendor_id):
+    return vendor_id.status_handler()
@@ -1,8 +1,7 @@
 from email.header import Header
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 from email import charset
 import smtplib
+import threading
 
 from library_registry.config import CannotLoadConfiguration, CannotSendEmail
 
@@ -96,12 +95,16 @@ class Emailer:
         self.from_address = from_address
         self.templates = templates
 
+        # An SMTP connection kept open between sends; see _send_email().
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+
         # Make sure the templates don't contain any template values we can't handle.
         test_template_values = dict((key, "value") for key in self.KNOWN_TEMPLATE_KEYS)
 
         for template in list(self.templates.values()):
             try:
-                template.body("from address", "to address", **test_template_values)
+                template.render("from address", "to address", **test_template_values)
             except Exception as e:
                 m = f"Template '{template.subject_template}'/'{template.body_template}' contains unrecognized key: {e}"
                 raise CannotLoadConfiguration(m)
@@ -133,13 +136,72 @@ class Emailer:
 
     ##### Private Methods ####################################################  # noqa: E266
     def _send_email(self, to_address, body, smtp=None):
-        """Actually send an email."""
-        smtp = smtp or smtplib.SMTP(self.smtp_host)
+        """
+        Actually send an email.
+
+        Connecting, negotiating TLS and logging in take several round trips, so one SMTP connection is kept
+        open and reused for every email this Emailer sends. If the connection has gone stale in the meantime
+        (usually because the server's idle timeout closed it), it's thrown away and the email is sent once
+        more on a fresh connection.
+
+        :param smtp: Use this object as a mock. It's connected, used for this one email, and closed.
+        """
+        if smtp:
+            self._log_in(smtp)
+            smtp.sendmail(self.from_address, to_address, body)
+            smtp.quit()
+            return
+
+        with self._smtp_lock:
+            reused = self._smtp is not None
+            try:
+                self._smtp_connection().sendmail(self.from_address, to_address, body)
+            except OSError as exc:
+                if not (reused and self._is_stale_connection_error(exc)):
+                    raise
+                self._close_smtp_connection()
+                self._smtp_connection().sendmail(self.from_address, to_address, body)
+
+    def _smtp_connection(self):
+        """Return the open SMTP connection, opening a new one if there isn't one."""
+        if self._smtp is None:
+            smtp = smtplib.SMTP()
+            try:
+                self._log_in(smtp)
+            except Exception:
+                smtp.close()    # Don't leak the socket if TLS negotiation or login fails after connecting.
+                raise
+            self._smtp = smtp
+
+        return self._smtp
+
+    def _close_smtp_connection(self):
+        """Forget the kept-open SMTP connection, closing its socket."""
+        (smtp, self._smtp) = (self._smtp, None)
+        try:
+            smtp.close()
+        except OSError:
+            pass
+
+    def _is_stale_connection_error(self, exc):
+        """
+        Does this error from an SMTP connection that's been sitting open mean the connection is no longer
+        usable? That's the case if the server hung up, if it answered 421 ("closing transmission channel",
+        which smtplib reports as e.g. SMTPSenderRefused), or if the socket itself failed.
+        """
+        if isinstance(exc, smtplib.SMTPServerDisconnected):
+            return True
+
+        if isinstance(exc, smtplib.SMTPResponseException):
+            return exc.smtp_code == 421
+
+        return not isinstance(exc, smtplib.SMTPException)
+
+    def _log_in(self, smtp):
+        """Connect an smtplib.SMTP object to the server, switch it to TLS, and log in."""
         smtp.connect(self.smtp_host, self.smtp_port)
         smtp.starttls()
         smtp.login(self.smtp_username, self.smtp_password)
-        smtp.sendmail(self.from_address, to_address, body)
-        smtp.quit()
 
     ##### Properties and Getters/Setters #####################################  # noqa: E266
 
@@ -197,6 +259,20 @@ class Emailer:
 class EmailTemplate:
     """A template for email messages."""
     ##### Class Constants ####################################################  # noqa: E266
+    # Every email we send is a single plain-text part, so the message is assembled directly instead of going
+    # through email.mime and the email.generator machinery.
+    MESSAGE_TEMPLATE = (
+        "From: %(from)s\n"
+        "To: %(to)s\n"
+        "Subject: %(subject)s\n"
+        "MIME-Version: 1.0\n"
+        "Content-Type: text/plain; charset=\"utf-8\"\n"
+        "Content-Transfer-Encoding: quoted-printable\n"
+        "\n"
+        "%(body)s"
+    )
+
+    UTF8 = charset.Charset('utf-8')
 
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
     def __init__(self, subject_template, body_template):
@@ -212,10 +288,22 @@ class EmailTemplate:
         :param kwargs: Arguments to use when filling out the template.
         """
 
-        message = MIMEMultipart('mixed')
-        message['From'] = from_header
-        message['To'] = to_header
-        message['Subject'] = Header(self.subject_template % kwargs, 'utf-8')
+        (subject, payload) = self.render(from_header, to_header, **kwargs)
+
+        return self.MESSAGE_TEMPLATE % {
+            "from": self._address_header(from_header),
+            "to": self._address_header(to_header),
+            "subject": Header(subject, self.UTF8).encode(maxlinelen=0),
+            "body": self.UTF8.body_encode(payload),
+        }
+
+    def render(self, from_header, to_header, **kwargs):
+        """
+        Fill out the subject and body templates, without building a MIME message around them.
+
+        :return: A 2-tuple (subject, payload).
+        """
+        subject = self.subject_template % kwargs
 
         # This might look ugly, because %(from_address)s in a template is expected to be an unadorned
         # email address, whereas this might look like '"Name" <email>', but it's better than nothing.
@@ -223,11 +311,7 @@ class EmailTemplate:
             if k not in kwargs:
                 kwargs[k] = v
 
-        payload = self.body_template % kwargs
-        text_part = MIMEText(payload, 'plain', 'utf-8')
-        message.attach(text_part)
-
-        return message.as_string()
+        return subject, self.body_template % kwargs
 
     ##### Private Methods ####################################################  # noqa: E266
 
@@ -236,3 +320,13 @@ class EmailTemplate:
     ##### Class Methods ######################################################  # noqa: E266
 
     ##### Private Class Methods ##############################################  # noqa: E266
+    @classmethod
+    def _address_header(cls, value):
+        """Prepare a From: or To: header value, encoding it only if it isn't plain ASCII."""
+        if "\n" in value or "\r" in value:
+            raise ValueError(f"Email header contains a line break: {value!r}")
+
+        if value.isascii():
+            return value
+
+        return Header(value, cls.UTF8).encode(maxlinelen=0)
@@ -248,10 +248,7 @@ class LibraryRegistryController(BaseController):
             encryptor = PKCS1_OAEP.new(public_key)
 
             if not library.short_name:
-                def dupe_check(candidate):
-                    return Library.for_short_name(self._db, candidate) is not None
-
-                library.short_name = Library.random_short_name(dupe_check)
+                library.short_name = Library.random_short_name(_db=self._db)
 
             generate_secret = bool((library.shared_secret is None) or reset_shared_secret)
 
@@ -1,10 +1,11 @@
 import base64
-import feedparser
+import codecs
 import json
 import logging
 from io import BytesIO
 from urllib.parse import urljoin
 
+from lxml import etree
 from PIL import Image
 from flask_babel import lazy_gettext as lgt
 
@@ -22,10 +23,44 @@ from library_registry.problem_details import (
 from library_registry.util.http import (HTTP, RequestTimedOut)
 from library_registry.util.problem_detail import ProblemDetail
 
+try:
+    import orjson
+except ImportError:     # orjson is an optional speedup; fall back to the standard library.
+    orjson = None
+
+_json_loads = orjson.loads if orjson else json.loads
+
+# Details for the problems that can come up while retrieving a document during registration. Each one is
+# filled in with the document's URL, but only when that problem actually happens.
+AUTH_DOCUMENT_NOT_FOUND = lgt("No Authentication For OPDS document present at %(url)s")
+AUTH_DOCUMENT_TIMEOUT = lgt("Timeout retrieving auth document %(url)s")
+AUTH_DOCUMENT_ERROR = lgt("Error retrieving auth document %(url)s")
+OPDS_ROOT_NOT_FOUND = lgt("No OPDS root document present at %(url)s")
+OPDS_ROOT_TIMEOUT = lgt("Timeout retrieving OPDS root document at %(url)s")
+OPDS_ROOT_ERROR = lgt("Error retrieving OPDS root document at %(url)s")
+BEHIND_AUTHENTICATION_GATEWAY = lgt("%(url)s is behind an authentication gateway")
+
+MAILTO_PREFIX = "mailto:"
+
 
 class LibraryRegistrar:
     """Encapsulates the logic of the library registration process."""
 
+    # Limits on logo images fetched during registration. Anything bigger than LOGO_MAX_BYTES or
+    # LOGO_MAX_PIXELS is rejected before it's decoded; anything bigger than LOGO_MAX_SIZE is
+    # scaled down before being stored.
+    LOGO_MAX_BYTES = 2 * 1024 * 1024
+    LOGO_MAX_PIXELS = 4000000
+    LOGO_MAX_SIZE = (512, 512)
+
+    # Response codes _make_request lets through. 404 (and 401, where it's allowed) are let through
+    # so that they can be turned into more specific problem details.
+    ALLOWED_RESPONSE_CODES = ("2xx", "3xx", 404)
+    ALLOWED_RESPONSE_CODES_WITH_401 = ALLOWED_RESPONSE_CODES + (401,)
+
+    # Media types a library's OPDS root may be served as.
+    OPDS_ROOT_MEDIA_TYPES = frozenset([OPDSCatalog.OPDS_TYPE, OPDSCatalog.OPDS_1_TYPE])
+
     def __init__(self, _db, do_get=HTTP.debuggable_get):
         self._db = _db
         self.do_get = do_get
@@ -73,11 +108,7 @@ class LibraryRegistrar:
 
         auth_url = library.authentication_url
         auth_response = self._make_request(
-            auth_url,
-            auth_url,
-            lgt("No Authentication For OPDS document present at %(url)s", url=auth_url),
-            lgt("Timeout retrieving auth document %(url)s", url=auth_url),
-            lgt("Error retrieving auth document %(url)s", url=auth_url),
+            auth_url, auth_url, AUTH_DOCUMENT_NOT_FOUND, AUTH_DOCUMENT_TIMEOUT, AUTH_DOCUMENT_ERROR
         )
 
         if isinstance(auth_response, ProblemDetail):
@@ -113,53 +144,33 @@ class LibraryRegistrar:
 
         # Make sure the authentication document includes a way for patrons to get help or file
         # a copyright complaint. These links must be stored in the database as Hyperlink objects.
-        links = auth_document.links or []
-
         for rel, problem_title in [
             ('help', "Invalid or missing patron support email address"),
             (Hyperlink.COPYRIGHT_DESIGNATED_AGENT_REL, "Invalid or missing copyright designated agent email address")
         ]:
-            uris = self._locate_email_addresses(rel, links, problem_title)
+            uris = self._locate_email_addresses(rel, auth_document.links_with_rel(rel), problem_title)
 
             if isinstance(uris, ProblemDetail):
                 return uris
 
             hyperlinks_to_create.append((rel, uris))
 
-        # Cross-check the opds_url to make sure it links back to the authentication document.
+        # Cross-check the opds_url to make sure it links back to the authentication document. The body
+        # is streamed, since a Link header is often enough and the root feed can be large.
         opds_response = self._make_request(
-            auth_url,
-            opds_url,
-            lgt("No OPDS root document present at %(url)s", url=opds_url),
-            lgt("Timeout retrieving OPDS root document at %(url)s", url=opds_url),
-            lgt("Error retrieving OPDS root document at %(url)s", url=opds_url),
-            allow_401=True
+            auth_url, opds_url, OPDS_ROOT_NOT_FOUND, OPDS_ROOT_TIMEOUT, OPDS_ROOT_ERROR, allow_401=True, stream=True
         )
 
         if isinstance(opds_response, ProblemDetail):
             return opds_response
 
-        content_type = opds_response.headers.get('Content-Type')
-        failure_detail = None
-
-        if opds_response.status_code == 401:
-            # This is only acceptable if the server returned a copy of
-            # the Authentication For OPDS document we just got.
-            if content_type != AuthenticationDocument.MEDIA_TYPE:
-                detail_msg = "401 response at %(url)s did not yield an Authentication For OPDS document"
-                failure_detail = lgt(detail_msg, url=opds_url)
-            elif not self.opds_response_links_to_auth_document(opds_response, auth_url):
-                detail_msg = (
-                    "Authentication For OPDS document guarding %(opds_url)s does not match the one at %(auth_url)s"
-                )
-                failure_detail = lgt(detail_msg, opds_url=opds_url, auth_url=auth_url)
-        elif content_type not in (OPDSCatalog.OPDS_TYPE, OPDSCatalog.OPDS_1_TYPE):
-            failure_detail = lgt("Supposed root document at %(url)s is not an OPDS document", url=opds_url)
-        elif not self.opds_response_links_to_auth_document(opds_response, auth_url):
-            detail_msg = (
-                "OPDS root document at %(opds_url)s does not link back to authentication document %(auth_url)s"
-            )
-            failure_detail = lgt(detail_msg, opds_url=opds_url, auth_url=auth_url)
+        try:
+            failure_detail = self._opds_root_failure(opds_response, opds_url, auth_url)
+        except Exception as e:
+            self.log.error("Registration of %s failed: error reading %s", auth_url, opds_url, exc_info=e)
+            return ERROR_RETRIEVING_DOCUMENT.detailed(OPDS_ROOT_ERROR % dict(url=opds_url))
+        finally:
+            opds_response.close()
 
         if failure_detail:
             self.log.error("Registration of %s failed: %s", auth_url, failure_detail)
@@ -190,7 +201,7 @@ class LibraryRegistrar:
                 url = urljoin(opds_url, url)
             logo_response = self.do_get(url, stream=True)
             try:
-                image = Image.open(logo_response.raw)
+                png = self._read_logo(logo_response.raw)
             except Exception:
                 image_url = auth_document.logo_link.get("href")
                 err_msg = "Registration of %s failed: could not read logo image %s"
@@ -198,10 +209,11 @@ class LibraryRegistrar:
                 return INVALID_INTEGRATION_DOCUMENT.detailed(
                     lgt("Could not read logo image %(image_url)s", image_url=image_url)
                 )
-            # Convert to PNG.
-            buffer = BytesIO()
-            image.save(buffer, format="PNG")
-            b64 = base64.b64encode(buffer.getvalue()).decode("utf8")
+            finally:
+                # A rejected logo may leave part of the body unread, which would keep the connection
+                # out of the pool.
+                logo_response.close()
+            b64 = base64.b64encode(png).decode("utf8")
             type = logo_response.headers.get("Content-Type") or auth_document.logo_link.get("type")
             if type:
                 library.logo = "data:%s;base64,%s" % (type, b64)
@@ -220,34 +232,108 @@ class LibraryRegistrar:
 
         return auth_document, hyperlinks_to_create
 
-    def _make_request(self, registration_url, url, on_404, on_timeout, on_exception, allow_401=False):
-        allowed_codes = ["2xx", "3xx", 404]
+    def _make_request(self, registration_url, url, on_404, on_timeout, on_exception, allow_401=False, stream=False):
+        """
+        Retrieve a document needed for registration.
+
+        `on_404`, `on_timeout` and `on_exception` are message templates for the corresponding
+        problems. They're filled in with `url` only if that problem happens.
+
+        If `stream` is True, the body isn't downloaded until it's used, and the caller must close the response.
+        A response that becomes a ProblemDetail is closed here.
+
+        :return: Either the response or a ProblemDetail.
+        """
+        allowed_codes = self.ALLOWED_RESPONSE_CODES_WITH_401 if allow_401 else self.ALLOWED_RESPONSE_CODES
 
-        if allow_401:
-            allowed_codes.append(401)
         try:
             response = self.do_get(
                 url, allowed_response_codes=allowed_codes,
-                timeout=30
+                timeout=30, stream=stream
             )
             # We only allowed 404 above so that we could return a more
             # specific problem detail document if it happened.
             if response.status_code == 404:
-                return INTEGRATION_DOCUMENT_NOT_FOUND.detailed(on_404)
+                response.close()    # A streamed body we won't read would keep its connection out of the pool.
+                return INTEGRATION_DOCUMENT_NOT_FOUND.detailed(on_404 % dict(url=url))
 
             if not allow_401 and response.status_code == 401:
+                response.close()
                 err_msg = "Registration of %s failed: %s is behind authentication gateway"
                 self.log.error(err_msg, registration_url, url)
-                return ERROR_RETRIEVING_DOCUMENT.detailed(lgt("%(url)s is behind an authentication gateway", url=url))
+                return ERROR_RETRIEVING_DOCUMENT.detailed(BEHIND_AUTHENTICATION_GATEWAY % dict(url=url))
         except RequestTimedOut as e:
             self.log.error("Registration of %s failed: timeout retrieving %s", registration_url, url, exc_info=e)
-            return TIMEOUT.detailed(on_timeout)
+            return TIMEOUT.detailed(on_timeout % dict(url=url))
         except Exception as e:
             self.log.error("Registration of %s failed: error retrieving %s", registration_url, url, exc_info=e)
-            return ERROR_RETRIEVING_DOCUMENT.detailed(on_exception)
+            return ERROR_RETRIEVING_DOCUMENT.detailed(on_exception % dict(url=url))
 
         return response
 
+    def _opds_root_failure(self, opds_response, opds_url, auth_url):
+        """
+        Make sure the response from a library's OPDS root links back to its authentication document.
+
+        :return: A description of the problem, or None if there isn't one.
+        """
+        content_type = opds_response.headers.get('Content-Type')
+
+        if opds_response.status_code == 401:
+            # This is only acceptable if the server returned a copy of
+            # the Authentication For OPDS document we just got.
+            if content_type != AuthenticationDocument.MEDIA_TYPE:
+                detail_msg = "401 response at %(url)s did not yield an Authentication For OPDS document"
+                return lgt(detail_msg, url=opds_url)
+            if not self.opds_response_links_to_auth_document(opds_response, auth_url):
+                detail_msg = (
+                    "Authentication For OPDS document guarding %(opds_url)s does not match the one at %(auth_url)s"
+                )
+                return lgt(detail_msg, opds_url=opds_url, auth_url=auth_url)
+        elif content_type not in self.OPDS_ROOT_MEDIA_TYPES:
+            return lgt("Supposed root document at %(url)s is not an OPDS document", url=opds_url)
+        elif not self.opds_response_links_to_auth_document(opds_response, auth_url):
+            detail_msg = (
+                "OPDS root document at %(opds_url)s does not link back to authentication document %(auth_url)s"
+            )
+            return lgt(detail_msg, opds_url=opds_url, auth_url=auth_url)
+
+        return None
+
+    @classmethod
+    def _read_logo(cls, raw):
+        """
+        Read a logo image from a file-like object and convert it to PNG, refusing to decode anything
+        unreasonably large.
+
+        A PNG that is already small enough is checked for integrity and returned as-is, since
+        decoding and re-encoding it would only cost time.
+
+        :return: PNG data (bytes or a memoryview) for an image no bigger than LOGO_MAX_SIZE.
+        :raise ValueError: If the image is too large to be a logo.
+        """
+        data = raw.read(cls.LOGO_MAX_BYTES + 1)
+        if len(data) > cls.LOGO_MAX_BYTES:
+            raise ValueError("Logo image is larger than %d bytes" % cls.LOGO_MAX_BYTES)
+
+        # Image.open() only reads the header, so the dimensions can be checked before any pixel data is decoded.
+        image = Image.open(BytesIO(data))
+        if image.width * image.height > cls.LOGO_MAX_PIXELS:
+            raise ValueError("Logo image is %dx%d pixels" % image.size)
+
+        if image.width > cls.LOGO_MAX_SIZE[0] or image.height > cls.LOGO_MAX_SIZE[1]:
+            image.draft("RGB", cls.LOGO_MAX_SIZE)
+            image.thumbnail(cls.LOGO_MAX_SIZE, Image.LANCZOS)
+        elif image.format == "PNG":
+            image.verify()
+            return data
+
+        # getbuffer() hands back the encoded image without copying it; it only needs to live long
+        # enough to be base64-encoded.
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getbuffer()
+
     @classmethod
     def opds_response_links(cls, response, rel):
         """Find all the links in the given response for the given link relation."""
@@ -261,34 +347,114 @@ class LibraryRegistrar:
         media_type = response.headers.get('Content-Type')
 
         if media_type == OPDSCatalog.OPDS_TYPE:             # Parse as OPDS 2.
-            catalog = json.loads(response.content)
-            links = []
-            for k, v in catalog.get("links", {}).items():
-                if k == rel:
-                    links.append(v.get("href"))
+            links.extend(cls._catalog_links(_json_loads(response.content), rel))
         elif media_type == OPDSCatalog.OPDS_1_TYPE:         # Parse as OPDS 1.
-            feed = feedparser.parse(response.content)
-            for link in feed.get("feed", {}).get("links", []):
-                if link.get('rel') == rel:
-                    links.append(link.get('href'))
+            links.extend(cls._feed_links(response.content, rel))
         elif media_type == AuthenticationDocument.MEDIA_TYPE:
-            document = json.loads(response.content)
+            document = _json_loads(response.content)
             if isinstance(document, dict):
                 links.append(document.get('id'))
 
         return [urljoin(response.url, url) for url in links if url]
 
+    @classmethod
+    def _catalog_links(cls, catalog, rel):
+        """
+        Find the hrefs of the links with the given rel in an OPDS 2 catalog.
+
+        OPDS 2 catalogs have a list of link objects, each of which may have a single rel or a list
+        of them. Older catalogs used a dictionary keyed by rel, which is also understood.
+        """
+        if not isinstance(catalog, dict):
+            return []
+
+        links = catalog.get("links") or []
+
+        if isinstance(links, dict):
+            link = links.get(rel)
+            return [link.get("href")] if isinstance(link, dict) else []
+
+        hrefs = []
+        for link in links:
+            if not isinstance(link, dict):
+                continue
+            link_rel = link.get("rel")
+            if link_rel == rel or (isinstance(link_rel, list) and rel in link_rel):
+                hrefs.append(link.get("href"))
+
+        return hrefs
+
+    @classmethod
+    def _feed_links(cls, content, rel):
+        """
+        Find the hrefs of the feed-level <link> tags with the given rel in an Atom feed.
+
+        Atom puts a feed's own links before its entries, so parsing stops at the first <entry>
+        rather than building the whole document. A malformed feed yields whatever links were
+        found before the problem.
+
+        Most feeds that don't have the link don't mention the rel at all, and can be ruled out with
+        a substring check instead of a parse.
+        """
+        if isinstance(content, str):
+            content = content.encode("utf8")
+
+        if cls._cannot_mention(content, rel):
+            return []
+
+        hrefs = []
+        depth = 0
+        parser = etree.iterparse(
+            BytesIO(content), events=("start", "end"), recover=True, resolve_entities=False, no_network=True
+        )
+        try:
+            for event, element in parser:
+                if event == "start":
+                    depth += 1
+                    if depth == 2 and etree.QName(element).localname == "entry":
+                        break
+                    continue
+
+                depth -= 1
+                if depth == 1 and etree.QName(element).localname == "link" and element.get("rel") == rel:
+                    hrefs.append(element.get("href"))
+        except etree.XMLSyntaxError:
+            pass
+
+        return hrefs
+
+    @classmethod
+    def _cannot_mention(cls, content, rel):
+        """
+        Can an XML document be ruled out as having the given rel, without parsing it?
+
+        This is only done when the rel would normally appear in the document verbatim: it must have
+        no characters that XML escapes, and the document must be in an ASCII-compatible encoding.
+        """
+        if any(c in rel for c in '<>&"\''):
+            return False
+        if content.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return False
+        return rel.encode("utf8") not in content
+
     @classmethod
     def opds_response_links_to_auth_document(cls, opds_response, auth_url):
         """
         Verify that the given response links to the given URL as its Authentication For OPDS document.
 
-        The link might happen in the `Link` header or in the body of an OPDS feed.
+        The link might happen in the `Link` header or in the body of an OPDS feed. The header is
+        checked first, so the body is only parsed if the header doesn't settle the question.
         """
+        rel = AuthenticationDocument.AUTHENTICATION_DOCUMENT_REL
+        header_url = (opds_response.links.get(rel) or {}).get('url')
+
+        if header_url and urljoin(opds_response.url, header_url) == auth_url:
+            return True
+
         links = []
 
         try:
-            links = cls.opds_response_links(opds_response, AuthenticationDocument.AUTHENTICATION_DOCUMENT_REL)
+            links = cls.opds_response_links(opds_response, rel)
         except ValueError:      # The response itself is malformed.
             return False
 
@@ -299,22 +465,12 @@ class LibraryRegistrar:
         """
         Find one or more email addresses in a list of links, all with a given `rel`.
 
-        :param library: A Library
         :param rel: The rel for this type of link.
-        :param links: A list of dictionaries with keys 'rel' and 'href'
+        :param links: A list of dictionaries with keys 'rel' and 'href', all of which have the given rel.
         :problem_title: The title to use in a ProblemDetail if no valid links are found.
         :return: Either a list of candidate links or a customized ProblemDetail.
         """
-        candidates = []
-
-        for link in links:
-            if link.get('rel') != rel:      # Wrong kind of link.
-                continue
-            uri = link.get('href')
-            value = cls._required_email_address(uri, problem_title)
-
-            if isinstance(value, str):
-                candidates.append(value)
+        candidates = [link.get('href') for link in links if cls._is_mailto(link.get('href'))]
 
         # There were no relevant links.
         if not candidates:
@@ -324,6 +480,11 @@ class LibraryRegistrar:
 
         return candidates
 
+    @staticmethod
+    def _is_mailto(uri):
+        """Is `uri` a mailto: URI?"""
+        return isinstance(uri, str) and uri.startswith(MAILTO_PREFIX)
+
     @classmethod
     def _required_email_address(cls, uri, problem_title):
         """
@@ -336,7 +497,7 @@ class LibraryRegistrar:
 
         if not uri:
             problem = on_error.detailed("No email address was provided")
-        elif not uri.startswith("mailto:"):
+        elif not cls._is_mailto(uri):
             problem = on_error.detailed(lgt("URI must start with 'mailto:' (got: %s)") % uri)
 
         if problem:
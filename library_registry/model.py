@@ -1,8 +1,10 @@
+import functools
 import json
 import logging
 import random
 import re
 import string
+import threading
 import uuid
 import warnings
 from collections import defaultdict
@@ -16,14 +18,16 @@ from sqlalchemy import (Boolean, Column, DateTime, Enum, ForeignKey, Index,
                         Integer, String, Table, Unicode, UniqueConstraint,
                         create_engine)
 from sqlalchemy import exc as sa_exc
-from sqlalchemy import func
+from sqlalchemy import func, inspect
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import (aliased, backref, relationship, sessionmaker,
-                            validates)
+from sqlalchemy.orm import (aliased, backref, relationship, selectinload,
+                            sessionmaker, validates)
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.orm.session import Session
-from sqlalchemy.sql.expression import (and_, cast, or_, select)
+from sqlalchemy.sql.expression import (and_, cast, exists, literal, or_,
+                                       select)
 
 from library_registry.constants import (
     LibraryType,
@@ -63,8 +67,22 @@ def production_session():
 
 class SessionManager:
     ##### Class Constants ####################################################  # noqa: E266
+    # Every caller asking for the same database URL shares one Engine, and so one connection pool.
     engine_for_url = {}
 
+    # Connection pool settings. Connections are checked before use and recycled every half hour, so
+    # that a connection dropped by the server or a proxy is replaced instead of failing a request.
+    POOL_SIZE = 10
+    POOL_MAX_OVERFLOW = 20
+    POOL_RECYCLE = 1800
+
+    # With psycopg2, executemany() calls (including the INSERTs the ORM batches up during a flush) go out
+    # a page at a time instead of one statement per round trip: INSERTs as multi-row VALUES lists, other
+    # statements joined together with psycopg2's execute_batch.
+    EXECUTEMANY_MODE = "values"
+    EXECUTEMANY_VALUES_PAGE_SIZE = 1000
+    EXECUTEMANY_BATCH_PAGE_SIZE = 500
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
     ##### Private Methods ####################################################  # noqa: E266
@@ -76,7 +94,21 @@ class SessionManager:
     @classmethod
     def engine(cls, url=None):
         url = url or Configuration.database_url()
-        return create_engine(url, echo=DEBUG)
+        engine = cls.engine_for_url.get(url)
+        if engine is None:
+            kwargs = dict()
+            if make_url(url).get_dialect().driver == "psycopg2":
+                kwargs = dict(
+                    executemany_mode=cls.EXECUTEMANY_MODE,
+                    executemany_values_page_size=cls.EXECUTEMANY_VALUES_PAGE_SIZE,
+                    executemany_batch_page_size=cls.EXECUTEMANY_BATCH_PAGE_SIZE,
+                )
+            engine = create_engine(
+                url, echo=DEBUG, pool_size=cls.POOL_SIZE, max_overflow=cls.POOL_MAX_OVERFLOW,
+                pool_pre_ping=True, pool_recycle=cls.POOL_RECYCLE, **kwargs
+            )
+            cls.engine_for_url[url] = engine
+        return engine
 
     @classmethod
     def sessionmaker(cls, url=None):
@@ -84,16 +116,19 @@ class SessionManager:
         return sessionmaker(bind=engine)
 
     @classmethod
-    def initialize(cls, url):
-        if url in cls.engine_for_url:
-            engine = cls.engine_for_url[url]
-            return engine, engine.connect()
+    def initialize(cls, url, force=False):
+        """
+        Get an engine and a connection for the given database URL, creating any missing tables.
 
+        :param force: If True, run create_all() even if every table already exists.
+        """
         engine = cls.engine(url)
 
-        Base.metadata.create_all(engine)
+        # create_all() checks for each table separately. Listing the existing tables is one query, and
+        # on an established database it's all that's needed.
+        if force or set(Base.metadata.tables) - set(inspect(engine).get_table_names()):
+            Base.metadata.create_all(engine)
 
-        cls.engine_for_url[url] = engine
         return engine, engine.connect()
 
     @classmethod
@@ -123,7 +158,6 @@ class Library(Base):
     PRODUCTION_STAGE    = 'production'  # Library should show up in production feed     # noqa: E221
     CANCELLED_STAGE     = 'cancelled'   # Library should not show up in any feed        # noqa: E221
     PLS_ID              = "pls_id"      # Public Library Surveys ID                     # noqa: E221
-    WHITESPACE_REGEX    = re.compile(r"\s+")                                            # noqa: E221
 
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
@@ -146,8 +180,15 @@ class Library(Base):
             raise ValueError("No Hyperlink hrefs were specified")
 
         default_href = hrefs[0]
-        _db = Session.object_session(self)
-        (hyperlink, is_modified) = get_one_or_create(_db, Hyperlink, library=self, rel=rel,)
+
+        # Registration sets several links in a row, so look through the library's hyperlinks (loaded
+        # once, in a single query) before asking the database about this rel in particular.
+        hyperlink = next((x for x in self.hyperlinks if x.rel == rel), None)
+        is_modified = False
+
+        if not hyperlink:
+            _db = Session.object_session(self)
+            (hyperlink, is_modified) = get_one_or_create(_db, Hyperlink, library=self, rel=rel,)
 
         if hyperlink.href not in hrefs:
             hyperlink.href = default_href
@@ -230,12 +271,14 @@ class Library(Base):
         if not self.in_production:
             return 0  # Count is only meaningful if the library is in production
 
-        query = db.query(DelegatedPatronIdentifier).filter(
+        # Count the IDs directly, rather than with Query.count(), which wraps a SELECT of every column
+        # in a subquery. This lets the (type, library_id, patron_identifier) unique index answer it.
+        query = db.query(func.count(DelegatedPatronIdentifier.id)).filter(
             DelegatedPatronIdentifier.type == DelegatedPatronIdentifier.ADOBE_ACCOUNT_ID,
             DelegatedPatronIdentifier.library_id == self.id
         )
 
-        return query.count()
+        return query.scalar()
 
     @property
     def in_production(self):
@@ -269,8 +312,9 @@ class Library(Base):
         """
         everywhere = None
 
-        # Group the ServiceAreas by type.
-        by_type = defaultdict(set)
+        # Count the focus and eligibility areas, keeping the first of each.
+        focus_count = eligibility_count = 0
+        focus_area = eligibility_area = None
 
         for a in self.service_areas:
             if not a.place:
@@ -281,16 +325,19 @@ class Library(Base):
                 everywhere = a.place
                 continue
 
-            by_type[a.type].add(a)
+            if a.type == ServiceArea.FOCUS:
+                focus_count += 1
+                focus_area = focus_area or a
+            elif a.type == ServiceArea.ELIGIBILITY:
+                eligibility_count += 1
+                eligibility_area = eligibility_area or a
 
         # If there is a single focus area, use it. Otherwise, if there is a single eligibility area, use that.
-        service_area = None
+        if focus_count == 1:
+            return focus_area.place
 
-        for area_type in ServiceArea.FOCUS, ServiceArea.ELIGIBILITY:
-            if len(by_type[area_type]) == 1:
-                [service_area] = by_type[area_type]
-                if service_area.place:
-                    return service_area.place
+        if eligibility_count == 1:
+            return eligibility_area.place
 
         # This library serves everywhere, and it doesn't _also_ serve some more specific place.
         if everywhere:
@@ -307,8 +354,8 @@ class Library(Base):
         This library does the best it can to express a library's service area as the name of a single place,
         but it's not always possible since libraries can have multiple service areas.
 
-        TODO: We'll want to fetch a library's ServiceAreas (and their Places) as part of the query that fetches
-        libraries, so that this doesn't result in extra DB queries per library.
+        When describing many libraries, call Library.load_service_areas() on them first, so this doesn't result
+        in extra DB queries per library.
 
         :return: A string, or None if the library's service area can't be described as a short string.
         """
@@ -321,15 +368,15 @@ class Library(Base):
     @classmethod
     def for_short_name(cls, _db, short_name):
         """Look up a library by short name."""
-        return get_one(_db, Library, short_name=short_name)
+        return _db.query(Library).filter(Library.short_name == short_name).one_or_none()
 
     @classmethod
     def for_urn(cls, _db, urn):
         """Look up a library by URN."""
-        return get_one(_db, Library, internal_urn=urn)
+        return _db.query(Library).filter(Library.internal_urn == urn).one_or_none()
 
     @classmethod
-    def random_short_name(cls, duplicate_check=None, max_attempts=20):
+    def random_short_name(cls, duplicate_check=None, max_attempts=20, _db=None):
         """
         Generate a random short name for a library.
 
@@ -337,11 +384,24 @@ class Library(Base):
 
         :param duplicate_check: Call this function to check whether a generated name is a duplicate.
         :param max_attempts: Stop trying to generate a name after this many failures.
-        """
+        :param _db: If provided, all `max_attempts` candidate names are generated up front and checked
+            against existing libraries in a single query, instead of calling `duplicate_check`.
+        """
+        if _db is not None:
+            candidates = [cls._random_short_name_candidate() for i in range(max_attempts)]
+            taken = {
+                short_name for (short_name,) in
+                _db.query(Library.short_name).filter(Library.short_name.in_(candidates))
+            }
+            for choice in candidates:
+                if choice not in taken:
+                    return choice
+            raise ValueError(f"Could not generate random short name after {max_attempts} attempts!")
+
         attempts = 0
         choice = None
         while not choice and attempts < max_attempts:
-            choice = "".join([random.choice(string.ascii_uppercase) for i in range(6)])
+            choice = cls._random_short_name_candidate()
 
             if callable(duplicate_check) and duplicate_check(choice):
                 choice = None
@@ -353,6 +413,32 @@ class Library(Base):
 
         return choice
 
+    @classmethod
+    def load_service_areas(cls, _db, libraries):
+        """
+        Load the ServiceAreas of many libraries, and the Places they cover, in as few queries as possible.
+
+        Describing a library's service area touches both relationships, and the parents of those Places,
+        so doing this first keeps a feed of libraries from querying the database once per library and
+        again per service area.
+
+        :param libraries: A list of Library objects. Their service_areas are populated in place.
+        """
+        library_ids = [library.id for library in libraries if library.id is not None]
+        if not library_ids:
+            return
+
+        # Naming a place walks all the way up its parents (a city's name includes its state), so load
+        # those too, one query per level: enough for a city, its county, its state and its nation.
+        # Place.children is eagerly joined by default; none of these places need it.
+        place = selectinload(Library.service_areas).joinedload(ServiceArea.place)
+        options = [place.lazyload(Place.children)]
+        for i in range(3):
+            place = place.selectinload(Place.parent)
+            options.append(place.lazyload(Place.children))
+
+        _db.query(Library).filter(Library.id.in_(library_ids)).options(*options).all()
+
     @classmethod
     def patron_counts_by_library(self, _db, libraries):
         """
@@ -470,51 +556,43 @@ class Library(Base):
             here = None
 
         library_query, place_query, place_type = cls.query_parts(query)
+        branches = []
+
         # We start with libraries that match the name query.
         if library_query:
-            libraries_for_name = cls.search_by_library_name(
-                _db, library_query, here, production).limit(
-                    max_libraries).all()
-        else:
-            libraries_for_name = []
+            branches.append(cls.search_by_library_name(_db, library_query, here, production))
 
         # We tack on any additional libraries that match a place query.
         if place_query:
-            libraries_for_location = cls.search_by_location_name(
-                _db, place_query, place_type, here, production
-            ).limit(max_libraries).all()
-        else:
-            libraries_for_location = []
-
-        if libraries_for_name and libraries_for_location:
-            # Filter out any libraries that show up in both lists.
-            for_name = set(libraries_for_name)
-            libraries_for_location = [
-                x for x in libraries_for_location if x not in for_name
-            ]
+            branches.append(cls.search_by_location_name(_db, place_query, place_type, here, production))
 
         # A lot of libraries list their locations only within their description, so it's worth
         # checking the description for the search term.
-        libraries_for_description = cls.search_within_description(
-            _db, query, here, production
-        ).limit(max_libraries).all()
+        branches.append(cls.search_within_description(_db, query, here, production))
 
-        all_results = libraries_for_name + libraries_for_location + libraries_for_description
-        unique_library_ids = []
+        # Run all the searches as one UNION ALL query, tagging each row with the search that found
+        # it so the results can be put back in order: name matches, then location matches, then
+        # description matches, each ordered by distance if we have one.
+        branches = [
+            qu.add_columns(literal(source).label("source")).limit(max_libraries)
+            for (source, qu) in enumerate(branches)
+        ]
+        rows = branches[0].union_all(*branches[1:]).all()
+
+        if here:
+            rows.sort(key=lambda row: (row.source, row[1] is None, row[1] or 0))
+        else:
+            rows.sort(key=lambda row: row.source)
+
+        # A library may be found by more than one search; it only shows up once, the first time.
+        unique_library_ids = set()
         unique_results = []
-        for library in all_results:
-            # Sometimes a 'library' in the list is a Library instance, sometimes it's a 2-tuple,
-            # of Library instance and distance.
-            if isinstance(library, Library) and library.id not in unique_library_ids:
-                unique_library_ids.append(library.id)
-                unique_results.append(library)
-            elif (
-                    isinstance(library, tuple)
-                    and isinstance(library[0], Library)
-                    and library[0].id not in unique_library_ids
-            ):
-                unique_library_ids.append(library[0].id)
-                unique_results.append(library)
+        for row in rows:
+            library = row[0]
+            if library.id in unique_library_ids:
+                continue
+            unique_library_ids.add(library.id)
+            unique_results.append((library, row[1]) if here else library)
 
         return unique_results
 
@@ -570,6 +648,7 @@ class Library(Base):
     us_zip = re.compile("^[0-9]{5}$")
     us_zip_plus_4 = re.compile("^[0-9]{5}-[0-9]{4}$")
     running_whitespace = re.compile(r"\s+")
+    library_indicator = re.compile(r"\b(?:public\s+library|library)\b")
 
     @classmethod
     def create_query(cls, _db, here=None, production=True, *args):
@@ -607,8 +686,7 @@ class Library(Base):
     @classmethod
     def query_cleanup(cls, query):
         """Clean up a query."""
-        query = query.lower()
-        query = cls.WHITESPACE_REGEX.sub(" ", query).strip()
+        query = " ".join(query.lower().split())     # split() also drops leading and trailing whitespace
         query = query.replace("libary", "library")  # Correct the most common misspelling of 'library'
         return query
 
@@ -645,13 +723,9 @@ class Library(Base):
         #
         # NOTE: This will fall down if there is a place with "Library" in the name, but there are no such
         # places in the US.
-        place_query = query
+        place_query = cls.library_indicator.sub("", query).strip()
         place_type = None
 
-        for indicator in 'public library', 'library':
-            if indicator in place_query:
-                place_query = place_query.replace(indicator, '').strip()
-
         (place_query, place_type) = Place.parse_name(place_query)
 
         return library_query, place_query, place_type
@@ -668,7 +742,8 @@ class Library(Base):
         is_long = func.length(field) >= 6
         close_enough = func.levenshtein(func.lower(field), value) <= 2
         long_value_is_approximate_match = (is_long & close_enough)
-        exact_match = field.ilike(value)
+        # Compare lowercased values instead of using ILIKE, so a '%' or '_' in the search isn't a wildcard.
+        exact_match = func.lower(field) == func.lower(value)
         return or_(long_value_is_approximate_match, exact_match)
 
     @classmethod
@@ -681,12 +756,21 @@ class Library(Base):
 
     @classmethod
     def get_hyperlink(cls, library, rel):
-        link = [x for x in library.hyperlinks if x.rel == rel]
-        if len(link) > 0:
-            return link[0]
+        # If the library's hyperlinks are already loaded, look through them. Otherwise fetch the one
+        # link through the (library_id, rel) unique constraint rather than loading all of them.
+        _db = Session.object_session(library)
+        if not _db or library.id is None or 'hyperlinks' not in inspect(library).unloaded:
+            return next((x for x in library.hyperlinks if x.rel == rel), None)
+
+        return _db.query(Hyperlink).filter(Hyperlink.library_id == library.id, Hyperlink.rel == rel).one_or_none()
 
     ##### Private Class Methods ##############################################  # noqa: E266
 
+    @classmethod
+    def _random_short_name_candidate(cls):
+        """Generate one candidate library short name: six random uppercase letters."""
+        return "".join(random.choices(string.ascii_uppercase, k=6))
+
     @classmethod
     def _feed_restriction(cls, production, library_field=None, registry_field=None):
         """
@@ -838,6 +922,19 @@ class Place(Base):
     LIBRARY_SERVICE_AREA    = PLACE_LIBRARY_SERVICE_AREA    # noqa: E221
     EVERYWHERE              = PLACE_EVERYWHERE              # noqa: E221
 
+    _uszipcode              = threading.local()             # noqa: E221
+
+    # The place types known to be bigger than each place type. See larger_place_types().
+    LARGER_PLACE_TYPES = {
+        NATION: (EVERYWHERE,),
+        EVERYWHERE: (EVERYWHERE,),
+        STATE: (EVERYWHERE, NATION),
+        COUNTY: (EVERYWHERE, NATION, STATE),
+        CITY: (EVERYWHERE, NATION, STATE, COUNTY),
+        POSTAL_CODE: (EVERYWHERE, NATION, STATE),
+        None: (EVERYWHERE, NATION),     # Any other type of place.
+    }
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
     def __repr__(self):
         parent = self.parent.external_name if self.parent else None
@@ -860,9 +957,11 @@ class Place(Base):
         Connecticut has no points inside New York, but the two states share a border. This method
         creates a more real-world notion of 'inside' that does not count a shared border.
         """
-        intersects = Place.geometry.intersects(self.geometry)
-        touches = func.ST_Touches(Place.geometry, self.geometry)
-        return qu.filter(intersects).filter(touches == False)       # noqa: E712
+        # The bounding box check (&&) can use the geometry index; the DE-9IM pattern then asks for the
+        # interiors to intersect, which a shared border alone doesn't satisfy.
+        bounding_boxes_intersect = Place.geometry.intersects(self.geometry)
+        interiors_intersect = func.ST_Relate(Place.geometry, self.geometry, "T********")
+        return qu.filter(bounding_boxes_intersect).filter(interiors_intersect)
 
     def lookup_inside(self, name, using_overlap=False, using_external_source=True):
         """
@@ -910,32 +1009,12 @@ class Place(Base):
         # happen if you search for "Springfield" or "Lake County" within the United States, instead of
         # specifying which state you're talking about.
         _db = Session.object_session(self)
-        qu = Place.lookup_by_name(_db, name).filter(Place.type != self.type)
-
-        # Don't look in a place type known to be 'bigger' than this place.
-        exclude_types = Place.larger_place_types(self.type)
-        qu = qu.filter(~Place.type.in_(exclude_types))
-
-        if self.type == self.EVERYWHERE:
-            # The concept of 'inside' is not relevant because every place is 'inside' EVERYWHERE.
-            # We are really trying to find one and only one place with a certain name.
-            pass
-        else:
-            if using_overlap and self.geometry is not None:
-                qu = self.overlaps_not_counting_border(qu)
-            else:
-                parent = aliased(Place)
-                grandparent = aliased(Place)
-                qu = qu.join(parent, Place.parent_id == parent.id)
-                qu = qu.outerjoin(grandparent, parent.parent_id == grandparent.id)
-
-                # For postal codes, but no other types of places, we allow the lookup to skip a level.
-                # This lets you look up "93203" within a state *or* within the nation.
-                postal_code_grandparent_match = and_(Place.type == Place.POSTAL_CODE, grandparent.id == self.id)
-                qu = qu.filter(or_(Place.parent == self, postal_code_grandparent_match))
+        qu = self._filter_inside(Place.lookup_by_name(_db, name), using_overlap)
 
-        places = qu.all()
-        if len(places) == 0:
+        # Two distinct places are enough to tell "one match" from "more than one". The limit applies to
+        # distinct place IDs, since lookup_by_name's alias join gives a place one row per alias.
+        place_ids = [place_id for (place_id,) in qu.with_entities(Place.id).distinct().limit(2)]
+        if len(place_ids) == 0:
             if using_external_source:
                 # We don't have any matching places in the database _now_, but there's a possibility
                 # we can find a representative postal code.
@@ -944,9 +1023,62 @@ class Place(Base):
                 # We're not allowed to use uszipcodes, probably because this method was called by
                 # lookup_through_external_source.
                 return None
-        if len(places) > 1:
+        if len(place_ids) > 1:
             raise MultipleResultsFound(f"More than one place called {name} inside {self.external_name}.")
-        return places[0]
+        return _db.query(Place).get(place_ids[0])
+
+    def lookup_inside_many(self, names):
+        """
+        Look up several named Places that are 'inside' this Place, with the same rules as lookup_inside()
+        (not using overlap), but in as few queries as possible.
+
+        Plain names like "Boston" are all looked up with a single query. Scoped names like "Boston, MA",
+        names that specify a place type like "Kern County", and names with no match in the database are
+        handed to lookup_inside() one at a time.
+
+        :param names: A list of place names.
+
+        :return: A 2-tuple (found, ambiguous). `found` maps each name to a Place, or to None if no match could
+            be found. `ambiguous` is a set of the names that matched more than one Place.
+        """
+        found = {}
+        ambiguous = set()
+        plain_names = {
+            name for name in names
+            if len(Place.name_parts(name)) == 1 and Place.parse_name(name)[1] is None
+        }
+
+        if plain_names:
+            _db = Session.object_session(self)
+            qu = _db.query(Place, PlaceAlias.name).outerjoin(PlaceAlias).filter(
+                or_(
+                    Place.external_name.in_(plain_names),
+                    Place.abbreviated_name.in_(plain_names),
+                    PlaceAlias.name.in_(plain_names),
+                )
+            ).filter(Place.type != Place.COUNTY)
+
+            matches = defaultdict(set)
+            for (place, alias_name) in self._filter_inside(qu):
+                for matched_name in {place.external_name, place.abbreviated_name, alias_name} & plain_names:
+                    matches[matched_name].add(place)
+
+            for (name, places) in matches.items():
+                if len(places) > 1:
+                    ambiguous.add(name)
+                else:
+                    [found[name]] = places
+
+        for name in names:
+            if name in found or name in ambiguous:
+                continue
+
+            try:
+                found[name] = self.lookup_inside(name)
+            except MultipleResultsFound:
+                ambiguous.add(name)
+
+        return found, ambiguous
 
     def lookup_one_through_external_source(self, name):
         """
@@ -962,25 +1094,14 @@ class Place(Base):
         if self.type != Place.STATE:
             return None         # uszipcodes keeps track of places in terms of their state.
 
-        search = uszipcode.SearchEngine(
-            db_file_dir=Configuration.DATADIR,
-            simple_zipcode=True
-        )
-        state = self.abbreviated_name
-        uszipcode_matches = []
-        if (state in search.state_to_city_mapper and name in search.state_to_city_mapper[state]):
-            # The given name is an exact match for one of the
-            # cities. Let's look up every ZIP code for that city.
-            uszipcode_matches = search.by_city_and_state(name, state, returns=None)
-
         # Look up a Place object for each ZIP code and return the
         # first one we actually know about.
         #
         # Set using_external_source to False to eliminate the
         # possibility of wasted effort or (I don't think this can
         # happen) infinite recursion.
-        for match in uszipcode_matches:
-            place = self.lookup_inside(match.zipcode, using_external_source=False)
+        for zipcode in self._uszipcode_zip_codes(self.abbreviated_name, name):
+            place = self.lookup_inside(zipcode, using_external_source=False)
             if place:
                 return place
 
@@ -996,6 +1117,36 @@ class Place(Base):
         qu = self.overlaps_not_counting_border(qu)
         return qu
 
+    ##### Private Methods ####################################################  # noqa: E266
+    def _filter_inside(self, qu, using_overlap=False):
+        """Restrict a query against Place to the places which count as 'inside' this Place. See lookup_inside()."""
+        qu = qu.filter(Place.type != self.type)
+
+        # Don't look in a place type known to be 'bigger' than this place.
+        exclude_types = Place.larger_place_types(self.type)
+        qu = qu.filter(~Place.type.in_(exclude_types))
+
+        if self.type == self.EVERYWHERE:
+            # The concept of 'inside' is not relevant because every place is 'inside' EVERYWHERE.
+            # We are really trying to find one and only one place with a certain name.
+            pass
+        else:
+            if using_overlap and self.geometry is not None:
+                qu = self.overlaps_not_counting_border(qu)
+            else:
+                # For postal codes, but no other types of places, we allow the lookup to skip a level.
+                # This lets you look up "93203" within a state *or* within the nation. The grandparent
+                # check is a correlated EXISTS rather than two self-joins, so it can be answered from
+                # the parent row alone.
+                parent = aliased(Place)
+                has_this_grandparent = exists().where(
+                    and_(parent.id == Place.parent_id, parent.parent_id == self.id)
+                )
+                postal_code_grandparent_match = and_(Place.type == Place.POSTAL_CODE, has_this_grandparent)
+                qu = qu.filter(or_(Place.parent == self, postal_code_grandparent_match))
+
+        return qu
+
     ##### SQLAlchemy Table properties ########################################  # noqa: E266
 
     __tablename__ = "places"
@@ -1150,21 +1301,14 @@ class Place(Base):
     @classmethod
     def larger_place_types(cls, type):
         """
-        Return a list of place types known to be bigger than `type`.
+        Return a tuple of the place types known to be bigger than `type`.
 
         Places don't form a strict heirarchy. In particular, ZIP codes are not 'smaller' than cities.
         But counties and cities are smaller than states, and states are smaller than nations, so
         if you're searching inside a state for a place called "Japan", you know that the nation of
         Japan is not what you're looking for.
         """
-        larger = [Place.EVERYWHERE]
-        if type not in (Place.NATION, Place.EVERYWHERE):
-            larger.append(Place.NATION)
-        if type in (Place.COUNTY, Place.CITY, Place.POSTAL_CODE):
-            larger.append(Place.STATE)
-        if type == Place.CITY:
-            larger.append(Place.COUNTY)
-        return larger
+        return cls.LARGER_PLACE_TYPES.get(type, cls.LARGER_PLACE_TYPES[None])
 
     @classmethod
     def parse_name(cls, place_name):
@@ -1215,19 +1359,20 @@ class Place(Base):
     @classmethod
     def to_geojson(cls, _db, *places):
         """Convert 1+ Place objects to a dict that will become a GeoJSON document when converted to JSON"""
+        # Have the database join the geometries into a single string, so there's one row to fetch and one
+        # document to parse no matter how many places there are.
         geojson = select(
-            [func.ST_AsGeoJSON(Place.geometry)]
+            [func.count(Place.id), func.string_agg(func.ST_AsGeoJSON(Place.geometry), ",")]
         ).where(
             Place.id.in_([x.id for x in places])
         )
-        results = [x[0] for x in _db.execute(geojson)]
-        if len(results) == 1:
+        (count, geometries) = _db.execute(geojson).first()
+        if count == 1:
             # There's only one item, and it is a valid GeoJSON document on its own.
-            return json.loads(results[0])
+            return json.loads(geometries)
 
         # We have either more or less than one valid item. In either case, a GeometryCollection is appropriate.
-        body = {"type": "GeometryCollection", "geometries": [json.loads(x) for x in results]}
-        return body
+        return json.loads('{"type": "GeometryCollection", "geometries": [%s]}' % (geometries or ""))
 
     @classmethod
     def name_parts(cls, name):
@@ -1244,6 +1389,40 @@ class Place(Base):
         """
         return [x.strip() for x in reversed(name.split(",")) if x.strip()]
 
+    ##### Private Class Methods ##############################################  # noqa: E266
+
+    @classmethod
+    def _uszipcode_search_engine(cls):
+        """
+        Get this thread's uszipcode SearchEngine, creating it the first time it's needed.
+
+        Opening the uszipcode database, and building its map of states to cities, is slow
+        enough that it shouldn't happen on every lookup. A SearchEngine can't be shared
+        between threads, so each thread gets its own.
+        """
+        search = getattr(cls._uszipcode, "search", None)
+        if search is None:
+            search = uszipcode.SearchEngine(db_file_dir=Configuration.DATADIR, simple_zipcode=True)
+            cls._uszipcode.search = search
+        return search
+
+    @classmethod
+    @functools.lru_cache(maxsize=2048)
+    def _uszipcode_zip_codes(cls, state, city):
+        """
+        Find the ZIP codes uszipcode knows about for the named city in the given state.
+
+        The uszipcode data doesn't change while we're running, so the answers are cached. Only the ZIP
+        code strings are kept, since uszipcode's own objects belong to one thread's SearchEngine.
+
+        :return: A tuple of ZIP codes, empty unless `city` is an exact match for a city in `state`.
+        """
+        search = cls._uszipcode_search_engine()
+        if state not in search.state_to_city_mapper or city not in search.state_to_city_mapper[state]:
+            return ()
+
+        return tuple(match.zipcode for match in search.by_city_and_state(city, state, returns=None))
+
 
 class PlaceAlias(Base):
     """An alternate name for a place."""
@@ -1291,14 +1470,14 @@ class Audience(Base):
     PRINT_DISABILITY = "print-disability"               # People with print disabilities
     OTHER = "other"                                     # A catch-all for other specialized audiences.
 
-    KNOWN_AUDIENCES = [
+    KNOWN_AUDIENCES = frozenset([
         EDUCATIONAL_PRIMARY,
         EDUCATIONAL_SECONDARY,
         OTHER,
         PRINT_DISABILITY,
         PUBLIC,
         RESEARCH,
-    ]
+    ])
 
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
@@ -1332,6 +1511,21 @@ class Audience(Base):
 
         return audience
 
+    @classmethod
+    def lookup_many(cls, _db, names):
+        """
+        Look up several Audiences with a single query, creating any that don't exist yet.
+
+        :return: A list of Audiences, in the same order as `names`.
+        """
+        for name in names:
+            if name not in cls.KNOWN_AUDIENCES:
+                raise ValueError(lgt("Unknown audience: %(name)s", name=name))
+
+        audiences = {audience.name: audience for audience in _db.query(Audience).filter(Audience.name.in_(names))}
+
+        return [audiences.get(name) or cls.lookup(_db, name) for name in names]
+
     ##### Private Class Methods ##############################################  # noqa: E266
 
 
@@ -1388,7 +1582,11 @@ class CollectionSummary(Base):
         # This also covers the case where the library specifies its collection size but doesn't mention any languages.
         language_code = LanguageCodes.string_to_alpha_3(language)
 
-        (summary, _) = get_one_or_create(_db, CollectionSummary, library=library, language=language_code)
+        # A registration sets one summary per language in a row, so look through the library's summaries
+        # (loaded once, in a single query) rather than querying for each language.
+        summary = next((x for x in library.collections if x.language == language_code), None)
+        if summary is None:
+            (summary, _) = create(_db, CollectionSummary, library=library, language=language_code)
         summary.size = size
 
         return summary
@@ -1650,7 +1848,7 @@ class Validation(Base):
             return None
         return self.started_at + self.EXPIRES_AFTER
 
-    @property
+    @hybrid_property
     def active(self):
         """
         Is this Validation still active?
@@ -1660,6 +1858,11 @@ class Validation(Base):
         now = datetime.utcnow()
         return not self.success and now < self.deadline
 
+    @active.expression
+    def active(cls):
+        """The same test in SQL, so queries can filter on it; comparing started_at can use its index."""
+        return and_(cls.success.isnot(True), cls.started_at > datetime.utcnow() - cls.EXPIRES_AFTER)
+
     ##### Class Methods ######################################################  # noqa: E266
 
     ##### Private Class Methods ##############################################  # noqa: E266
@@ -1943,6 +2146,9 @@ class ConfigurationSetting(Base):
     MEANS_YES = set(['true', 't', 'yes', 'y'])
     SECRET_SETTING_KEYWORDS = set(['password', 'secret'])
 
+    # Where sitewide() keeps the IDs of the sitewide settings it has found, in a database session's info dictionary.
+    SITEWIDE_IDS_KEY = 'configurationsetting.sitewide_ids'
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
     def __repr__(self):
@@ -2131,8 +2337,29 @@ class ConfigurationSetting(Base):
 
     @classmethod
     def sitewide(cls, _db, key):
-        """Find or create a sitewide ConfigurationSetting."""
-        return cls.for_library_and_externalintegration(_db, key, None, None)
+        """
+        Find or create a sitewide ConfigurationSetting.
+
+        The setting's ID is remembered for the rest of the database session, so asking for the same setting
+        again (as sending several emails, or building a feed, does) is normally an identity map hit rather
+        than a query. Only the ID is kept, so a setting that was rolled back or deleted is simply looked up again.
+        """
+        setting_ids = _db.info.setdefault(cls.SITEWIDE_IDS_KEY, {})
+
+        setting = None
+        if key in setting_ids:
+            setting = _db.query(ConfigurationSetting).get(setting_ids[key])
+
+        if (
+            setting is None
+            or setting.key != key
+            or setting.library_id is not None
+            or setting.external_integration_id is not None
+        ):
+            setting = cls.for_library_and_externalintegration(_db, key, None, None)
+            setting_ids[key] = setting.id
+
+        return setting
 
     @classmethod
     def for_library(cls, key, library):
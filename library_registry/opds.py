@@ -9,6 +9,7 @@ from library_registry.constants import LibraryType
 from library_registry.model import (
     ConfigurationSetting,
     Hyperlink,
+    Library,
     Validation,
 )
 
@@ -55,6 +56,13 @@ class OPDSCatalog:
         #
         # To save time, omit service area information from large feeds which we know won't use it.
         include_logos = include_service_areas = not (self._feed_is_large(_db, libraries))
+
+        if include_service_areas:
+            libraries = list(libraries)
+            Library.load_service_areas(
+                _db, [x[0] if isinstance(x, tuple) else x for x in libraries]
+            )
+
         self.catalog = dict(metadata=dict(title=title), catalogs=[])
 
         self.add_link_to_catalog(self.catalog, rel="self", href=url, type=self.OPDS_TYPE)
@@ -332,19 +332,41 @@ class RegistrationRefreshScript(LibraryScript):
 
     REQUIRES_SINGLE_LIBRARY = False
 
+    # Successful reregistrations are committed in batches of this size, rather than one transaction
+    # per library. Each library is reregistered inside its own savepoint, so a failure only undoes
+    # that library's changes.
+    COMMIT_EVERY = 50
+
     def run(self, cmd_args=None):
         parsed = self.parse_command_line(self._db, cmd_args)
         registrar = self.registrar
-        for library in self.libraries(parsed.library):
-            result = registrar.reregister(library)
-            if isinstance(result, ProblemDetail):
-                self.log.error(
-                    "FAILURE %s (%s) uri=%s, title=%s, detail=%s, debug=%s",
-                    library.name, library.authentication_url,
-                    result.uri, result.title, result.detail, result.debug_message
-                )
-            else:
-                self.log.info("SUCCESS %s (%s)", library.name, library.authentication_url)
+        uncommitted = 0
+        try:
+            for library in self.libraries(parsed.library):
+                savepoint = self._db.begin_nested()
+                try:
+                    result = registrar.reregister(library)
+                except Exception:
+                    savepoint.rollback()
+                    raise
+
+                if isinstance(result, ProblemDetail):
+                    self.log.error(
+                        "FAILURE %s (%s) uri=%s, title=%s, detail=%s, debug=%s",
+                        library.name, library.authentication_url,
+                        result.uri, result.title, result.detail, result.debug_message
+                    )
+                    savepoint.rollback()
+                else:
+                    savepoint.commit()
+                    self.log.info("SUCCESS %s (%s)", library.name, library.authentication_url)
+                    uncommitted += 1
+                    if uncommitted >= self.COMMIT_EVERY:
+                        self._db.commit()
+                        uncommitted = 0
+        finally:
+            # Don't lose the libraries that were refreshed before something went wrong.
+            if uncommitted:
                 self._db.commit()
 
     @property
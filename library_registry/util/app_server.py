@@ -6,10 +6,9 @@ import traceback
 import flask
 from lxml import etree
 from psycopg2 import DatabaseError
-from psycopg2.extensions import adapt as sqlescape
 from flask import make_response
 from flask_babel import lazy_gettext as lgt
-from sqlalchemy.sql import compiler
+from sqlalchemy.exc import CompileError
 
 from library_registry.opds import OPDSCatalog
 
@@ -108,17 +107,12 @@ class HeartbeatController:
 
 
 def dump_query(query):
+    """Render a SQLAlchemy query as a SQL string with its parameters filled in, for debugging."""
     dialect = query.session.bind.dialect
-    statement = query.statement
-    comp = compiler.SQLCompiler(dialect, statement)
-    comp.compile()
-    enc = dialect.encoding
-    params = {}
-
-    for (k, v) in comp.params.items():
-        if isinstance(v, str):
-            v = v.encode(enc)
-
-        params[k] = sqlescape(v)
-
-    return (comp.string.encode(enc) % params).decode(enc)
+    try:
+        return str(query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    except (CompileError, NotImplementedError):
+        # Some parameter types (datetimes, geometries) can't be rendered as literals. Show the
+        # statement with its placeholders, followed by the parameters.
+        compiled = query.statement.compile(dialect=dialect)
+        return "%s\n%r" % (compiled, compiled.params)
@@ -0,0 +1,77 @@
+"""
+A small in-process cache, for results which are expensive to compute and safe to reuse for a while.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a time-to-live.
+
+    Expired entries are dropped lazily, when they are next looked up or when they fall off the end
+    of the LRU ordering.
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        """
+        :param maxsize: (int) - The maximum number of entries to hold
+        :param ttl: (int, float) - The default number of seconds an entry stays valid
+        :param timer: (callable) - Returns the current time in seconds. Overridable for tests.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        """Return the value stored under key, or default if there is no unexpired entry for it."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            (expires_at, value) = entry
+            if expires_at <= self.timer():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store value under key.
+
+        :param ttl: (int, float) - Seconds until this entry expires, if sooner than the cache's default.
+            An entry with a ttl of zero or less is not stored.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (self.timer() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_MISSING = object()
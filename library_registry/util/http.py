@@ -1,5 +1,7 @@
+import http.cookiejar
 import logging
 import requests
+import threading
 import urllib.parse
 from flask_babel import lazy_gettext as lgt
 
@@ -184,6 +186,17 @@ class HTTP:
     """A helper for the `requests` module."""
     ##### Class Constants ####################################################  # noqa: E266
 
+    # Connections kept open per host by the shared connection pool. Registration hits the same library
+    # host several times in a row (auth document, OPDS root, logo), so those requests can reuse
+    # one connection instead of each paying for a new TCP and TLS handshake.
+    POOL_MAXSIZE = 16
+
+    # Only the adapter (and so the connection pool) is shared. A requests.Session isn't guaranteed to be
+    # thread-safe, so each thread gets its own, and none of them keep cookies: every request is as
+    # stateless as a bare requests.request() call.
+    _adapter = None
+    _sessions = threading.local()
+
     ##### Public Interface / Magic Methods ###################################  # noqa: E266
 
     ##### Private Methods ####################################################  # noqa: E266
@@ -214,6 +227,23 @@ class HTTP:
         """Call requests.request and turn a timeout into a RequestTimedOut exception."""
         return cls._request_with_timeout(url, requests.request, http_method, *args, **kwargs)
 
+    @classmethod
+    def session(cls):
+        """
+        Return this thread's `requests.Session` for debuggable requests, creating it if necessary. Every
+        thread's session sends its requests through the same pooled adapter.
+        """
+        session = getattr(cls._sessions, 'session', None)
+        if session is None:
+            if cls._adapter is None:
+                cls._adapter = requests.adapters.HTTPAdapter(pool_maxsize=cls.POOL_MAXSIZE)
+            session = requests.Session()
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            session.mount("http://", cls._adapter)
+            session.mount("https://", cls._adapter)
+            cls._sessions.session = session
+        return session
+
     @classmethod
     def series(cls, status_code):
         """Return the HTTP series for the given status code."""
@@ -243,7 +273,7 @@ class HTTP:
         :param kwargs: Keyword arguments for the make_request_with function.
         """
         logging.info("Making debuggable %s request to %s: kwargs %r", http_method, url, kwargs)
-        make_request_with = make_request_with or requests.request
+        make_request_with = make_request_with or cls.session().request
         return cls._request_with_timeout(url, make_request_with, http_method,
                                          process_response_with=cls.process_debuggable_response, **kwargs)
 
@@ -73,6 +73,22 @@ class ShortClientTokenTool:
         """
         return max(int((d-cls.JWT_EPOCH).total_seconds()), 0)
 
+    @classmethod
+    def expiration_datetime(cls, expiration):
+        """
+        Turn the expiration number from a token into a datetime.
+
+        Currently there are two ways of specifying a token's expiration date: as a number of minutes since
+        SCT_EPOCH or as a number of seconds since JWT_EPOCH.
+        """
+        # NOTE: The JWT code needs to be removed by the year 4869 or this will break.
+        if expiration < 1500000000:
+            # This is a number of minutes since the start of 2017.
+            return cls.SCT_EPOCH + datetime.timedelta(minutes=expiration)
+
+        # This is a number of seconds since the start of 1970.
+        return cls.JWT_EPOCH + datetime.timedelta(seconds=expiration)
+
     ##### Private Class Methods ##############################################  # noqa: E266
 
 
@@ -151,7 +167,7 @@ class ShortClientTokenDecoder(ShortClientTokenTool):
         return value
 
     def __init__(self, node_value, delegates):
-        super(ShortClientTokenDecoder, self).__init__()
+        super().__init__()
         if isinstance(node_value, str):
             # The node value may be stored in hex (that's how Adobe gives it out), or the equivalent decimal value.
             if node_value.startswith('0x'):
@@ -215,19 +231,48 @@ class ShortClientTokenDecoder(ShortClientTokenTool):
 
         return delegated_patron_identifier
 
+    def expiration(self, token):
+        """
+        Find when a short client token expires, without validating it.
+
+        :param token: The full token, or just its 'username' part.
+
+        :return: A datetime, or None if the token can't be parsed.
+        """
+        try:
+            (_, expiration, _) = self._parse_token(token)
+        except (AttributeError, ValueError):
+            return None
+
+        return self.expiration_datetime(expiration)
+
     ##### Private Methods ####################################################  # noqa: E266
 
-    def _split_token(self, _db, token):
+    def _parse_token(self, token):
         """
-        Split the 'username' part of a Short Client Token.
+        Split the 'username' part of a Short Client Token without looking anything up.
 
-        :return: A 3-tuple (Library, expiration, foreign patron identifier)
+        :return: A 3-tuple (library short name, expiration, foreign patron identifier)
         """
         if token.count('|') < 2:
             raise ValueError("Invalid client token: %s" % token)
 
         (library_short_name, expiration, patron_identifier) = token.split("|", 2)
-        library_short_name = library_short_name.upper()
+
+        try:
+            expiration = float(expiration)
+        except ValueError:
+            raise ValueError('Expiration time "%s" is not numeric.' % expiration)
+
+        return library_short_name.upper(), expiration, patron_identifier
+
+    def _split_token(self, _db, token):
+        """
+        Split the 'username' part of a Short Client Token.
+
+        :return: A 3-tuple (Library, expiration, foreign patron identifier)
+        """
+        (library_short_name, expiration, patron_identifier) = self._parse_token(token)
 
         # Look up the Library object based on short name.
         library = get_one(_db, Library, short_name=library_short_name)
@@ -235,33 +280,28 @@ class ShortClientTokenDecoder(ShortClientTokenTool):
         if not library:
             raise ValueError("I don't know how to handle tokens from library \"%s\"" % library_short_name)
 
-        try:
-            expiration = float(expiration)
-        except ValueError:
-            raise ValueError('Expiration time "%s" is not numeric.' % expiration)
-
         return library, expiration, patron_identifier
 
     def _decode(self, _db, token, supposed_signature):
         """Make sure a client token is properly formatted, correctly signed, and not expired."""
         (library, expiration, patron_identifier) = self._split_token(_db, token)
+        self._verify(library, token, expiration, patron_identifier, supposed_signature)
+
+        # We have a Library, and a patron identifier which we know is valid.
+        # Find or create a DelegatedPatronIdentifier for this person.
+        return patron_identifier, self.uuid
+
+    def _verify(self, library, token, expiration, patron_identifier, supposed_signature):
+        """Make sure an already-split client token is not expired and is correctly signed by its library."""
         secret = library.shared_secret
 
         # We don't police the content of the patron identifier but there has to be _something_ there.
         if not patron_identifier:
             raise ValueError(f"Token {token} has empty patron identifier.")
 
-        # Don't bother checking an expired token. Currently there are two ways of specifying a token's
-        # expiration date: as a number of minutes since self.SCT_EPOCH or as a number of seconds since self.JWT_EPOCH.
+        # Don't bother checking an expired token.
         now = datetime.datetime.utcnow()
-
-        # NOTE: The JWT code needs to be removed by the year 4869 or this will break.
-        if expiration < 1500000000:
-            # This is a number of minutes since the start of 2017.
-            expiration = self.SCT_EPOCH + datetime.timedelta(minutes=expiration)
-        else:
-            # This is a number of seconds since the start of 1970.
-            expiration = self.JWT_EPOCH + datetime.timedelta(seconds=expiration)
+        expiration = self.expiration_datetime(expiration)
 
         if expiration < now:
             raise ValueError(f"Token {token} expired at {expiration} (now is {now}).")
@@ -274,10 +314,6 @@ class ShortClientTokenDecoder(ShortClientTokenTool):
         if actual_signature != supposed_signature:
             raise ValueError(f"Invalid signature for {token}.")
 
-        # We have a Library, and a patron identifier which we know is valid.
-        # Find or create a DelegatedPatronIdentifier for this person.
-        return patron_identifier, self.uuid
-
     ##### Properties and Getters/Setters #####################################  # noqa: E266
 
     ##### Class Methods ######################################################  # noqa: E266
@@ -31,6 +31,19 @@ class MockPlace:
 
         return place
 
+    def lookup_inside_many(self, names):
+        found = dict()
+        ambiguous = set()
+
+        for name in names:
+            place = self.inside.get(name)
+            if place is self.AMBIGUOUS:
+                ambiguous.add(name)
+            else:
+                found[name] = place
+
+        return found, ambiguous
+
     ##### Private Methods ####################################################  # noqa: E266
 
     ##### Properties and Getters/Setters #####################################  # noqa: E266
@@ -65,11 +78,15 @@ class DummyHTTPResponse:
         self.content = content
         self.links = links or {}
         self.url = url or "http://url/"
+        self.closed = False
 
     @property
     def raw(self):
         return BytesIO(self.content)
 
+    def close(self):
+        self.closed = True
+
 
 class DummyHTTPClient:
     def __init__(self):
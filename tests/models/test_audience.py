@@ -41,3 +41,23 @@ class TestAudienceModel:
             Audience.lookup(db_session, unknown_audience)
 
         assert db_session.query(Audience).count() == 0
+
+    def test_lookup_many(self, db_session):
+        """
+        GIVEN: A list of audience names, some of which already have Audience objects
+        WHEN:  Audience.lookup_many() is called on that list
+        THEN:  The existing Audiences should be found, the missing ones created, and unknown names refused
+        """
+        existing = Audience.lookup(db_session, Audience.PUBLIC)
+
+        [public, research] = Audience.lookup_many(db_session, [Audience.PUBLIC, Audience.RESEARCH])
+        assert public == existing
+        assert research.name == Audience.RESEARCH
+        assert db_session.query(Audience).count() == 2
+
+        with pytest.raises(ValueError):
+            Audience.lookup_many(db_session, [Audience.PUBLIC, "somebody-we-dont-know"])
+
+        for audience in (public, research):
+            db_session.delete(audience)
+        db_session.commit()
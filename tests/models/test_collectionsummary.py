@@ -26,6 +26,23 @@ class TestCollectionSummaryModel:
             db_session.delete(db_item)
         db_session.commit()
 
+    def test_set_updates_existing_summary(self, db_session, create_test_library):
+        """
+        GIVEN: A Library instance with a CollectionSummary for a language
+        WHEN:  CollectionSummary.set() is called again for that language
+        THEN:  The existing CollectionSummary should be updated rather than a new one created
+        """
+        library = create_test_library(db_session)
+        summary1 = CollectionSummary.set(library, "eng", 100)
+        summary2 = CollectionSummary.set(library, "eng", 150)
+        assert summary2 is summary1
+        assert summary2.size == 150
+        assert library.collections == [summary1]
+
+        db_session.delete(library)
+        db_session.delete(summary1)
+        db_session.commit()
+
     def test_set_unknown_language_set_to_none(self, db_session, create_test_library):
         """
         GIVEN: A Library instance
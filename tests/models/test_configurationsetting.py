@@ -439,6 +439,28 @@ class TestConfigurationSettingModel:
         db_session.delete(created_setting)
         db_session.commit()
 
+    def test_sitewide_remembers_setting(self, db_session):
+        """
+        GIVEN: A sitewide ConfigurationSetting that has already been looked up in a database session
+        WHEN:  ConfigurationSetting.sitewide() is called again for that key, before and after the setting is deleted
+        THEN:  The same setting should be returned until it's deleted, and a new one should be created afterwards
+        """
+        keyname = "test_sitewide_remembers_setting"
+        created_setting = ConfigurationSetting.sitewide(db_session, keyname)
+        assert db_session.info[ConfigurationSetting.SITEWIDE_IDS_KEY][keyname] == created_setting.id
+        assert ConfigurationSetting.sitewide(db_session, keyname) is created_setting
+
+        db_session.delete(created_setting)
+        db_session.commit()
+
+        new_setting = ConfigurationSetting.sitewide(db_session, keyname)
+        assert new_setting.key == keyname
+        assert new_setting.id != created_setting.id
+        assert db_session.query(ConfigurationSetting).count() == 1
+
+        db_session.delete(new_setting)
+        db_session.commit()
+
     def test_sitewide_secret(self, db_session, monkeypatch):
         """
         GIVEN: A key name
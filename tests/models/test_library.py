@@ -3,6 +3,7 @@ import re
 import uuid
 
 import pytest
+from sqlalchemy import inspect
 
 from library_registry.constants import LibraryType
 from library_registry.model import (
@@ -295,6 +296,32 @@ class TestLibraryModel:
         db_session.delete(place)
         db_session.commit()
 
+    def test_load_service_areas(self, db_session, create_test_library, create_test_place):
+        """
+        GIVEN: Several Libraries whose service areas haven't been loaded
+        WHEN:  Library.load_service_areas() is called on them
+        THEN:  Each Library's service areas and their places are available without further queries
+        """
+        places = [create_test_place(db_session, place_type=Place.CITY) for _ in range(2)]
+        libraries = [create_test_library(db_session, eligibility_areas=[place]) for place in places]
+        db_session.commit()
+        db_session.expire_all()
+
+        Library.load_service_areas(db_session, libraries)
+        for library in libraries:
+            assert 'service_areas' in library.__dict__
+            [service_area] = library.service_areas
+            assert 'place' in service_area.__dict__
+
+        assert [lib.service_area for lib in libraries] == places
+
+        # An empty list is fine.
+        Library.load_service_areas(db_session, [])
+
+        for place in places:
+            db_session.delete(place)
+        db_session.commit()
+
     def test_types(
         self, db_session, create_test_place, create_test_library, zip_10018,
         new_york_city, new_york_state
@@ -358,7 +385,7 @@ class TestLibraryModel:
         THEN:  A seed-determined value or values are generated which are six ascii uppercase characters
         """
         random.seed(42)
-        SEED_42_FIRST_VALUE = "UDAXIH"
+        SEED_42_FIRST_VALUE = "QAHFTR"
         generated_name = Library.random_short_name()
         assert generated_name == SEED_42_FIRST_VALUE
         assert re.match
@@ -370,8 +397,8 @@ class TestLibraryModel:
         THEN:  The next seeded name value should be returned
         """
         random.seed(42)
-        SEED_42_FIRST_VALUE = "UDAXIH"
-        SEED_42_SECOND_VALUE = "HEXDVX"
+        SEED_42_FIRST_VALUE = "QAHFTR"
+        SEED_42_SECOND_VALUE = "XCKAFN"
 
         assert Library.random_short_name() == SEED_42_FIRST_VALUE     # Call once to move past initial value
         name = Library.random_short_name(duplicate_check=lambda x: x == SEED_42_FIRST_VALUE)
@@ -387,6 +414,29 @@ class TestLibraryModel:
             Library.random_short_name(duplicate_check=lambda x: True)
         assert "Could not generate random short name after 20 attempts!" in str(exc.value)
 
+    def test_random_short_name_checks_database(self, db_session, create_test_library):
+        """
+        GIVEN: A Library which already has the first seeded short name
+        WHEN:  Library.random_short_name() is called with a database session
+        THEN:  The first seeded name that isn't taken is returned
+        """
+        random.seed(42)
+        SEED_42_FIRST_VALUE = "QAHFTR"
+        SEED_42_SECOND_VALUE = "XCKAFN"
+        library = create_test_library(db_session, short_name=SEED_42_FIRST_VALUE)
+
+        random.seed(42)
+        assert Library.random_short_name(_db=db_session) == SEED_42_SECOND_VALUE
+
+        # If every candidate is taken, a ValueError is raised.
+        random.seed(42)
+        with pytest.raises(ValueError) as exc:
+            Library.random_short_name(max_attempts=1, _db=db_session)
+        assert "Could not generate random short name after 1 attempts!" in str(exc.value)
+
+        db_session.delete(library)
+        db_session.commit()
+
     def test_get_hyperlink(self, db_session, create_test_library):
         """
         GIVEN: An existing Library object
@@ -406,6 +456,12 @@ class TestLibraryModel:
         assert isinstance(help_link, Hyperlink)
         assert link2 == help_link
 
+        # With the library's hyperlinks not loaded, the one link is looked up on its own.
+        db_session.expire(library, ["hyperlinks"])
+        assert Library.get_hyperlink(library, "help_email") == link2
+        assert "hyperlinks" in inspect(library).unloaded
+        assert Library.get_hyperlink(library, "copyright_email") is None
+
     def test_patron_counts_by_library(self, db_session, create_test_library):
         """
         GIVEN: Multiple existing Libraries, each with some number of patrons
@@ -535,6 +591,8 @@ class TestLibraryModel:
             pytest.param("kern county library", ("kern county library", "kern", Place.COUNTY), id="kern_county"),
             pytest.param("new york state library", ("new york state library", "new york", Place.STATE), id="ny_state"),
             pytest.param("lapl", ("lapl", "lapl", None), id="lapl"),
+            pytest.param("librarything", ("librarything", "librarything", None), id="library_inside_a_word"),
+            pytest.param("public library of boston", ("public library of boston", "of boston", None), id="library_first"),
         ]
     )
     def test_query_parts(self, input, output):
@@ -3,6 +3,7 @@ Tests for the Place, PlaceAlias, and ServiceArea models.
 """
 import json
 import os
+import threading
 import uuid
 from pathlib import Path
 
@@ -11,7 +12,8 @@ from sqlalchemy import func
 from sqlalchemy.orm.exc import MultipleResultsFound
 
 from library_registry.config import Configuration
-from library_registry.model import ConfigurationSetting, Place
+from library_registry.model import ConfigurationSetting, Place, PlaceAlias
+from library_registry.model_helpers import get_one_or_create
 from library_registry.util.geo import Location
 
 
@@ -452,6 +454,53 @@ class TestPlaceModel:
         assert zip_10018.lookup_inside("New York", using_overlap=True) == nyc
         assert zip_10018.lookup_inside("New York", using_overlap=False) is None
 
+    def test_lookup_inside_place_with_several_aliases(self, db_session, create_test_place):
+        """
+        GIVEN: Two cities with the same name inside a state, the first of which has several aliases
+        WHEN:  .lookup_inside() is called on the state with that name
+        THEN:  MultipleResultsFound should be raised, since the name is ambiguous
+        """
+        state = create_test_place(db_session, external_name="Illinois", place_type=Place.STATE)
+        first = create_test_place(db_session, external_name="Springfield", place_type=Place.CITY, parent=state)
+        create_test_place(db_session, external_name="Springfield", place_type=Place.CITY, parent=state)
+        for alias in ("Springfield IL", "Capital City"):
+            get_one_or_create(db_session, PlaceAlias, place=first, name=alias)
+
+        with pytest.raises(MultipleResultsFound):
+            state.lookup_inside("Springfield", using_external_source=False)
+
+        # With only one place by that name, the aliased place is found.
+        assert state.lookup_inside("Springfield IL", using_external_source=False) == first
+
+    def test_lookup_inside_many(self, db_session, places):
+        """
+        GIVEN: A Place and a list of plain, scoped, unknown, and ambiguous place names
+        WHEN:  .lookup_inside_many() is called with those names
+        THEN:  Each name should resolve to the same Place that .lookup_inside() finds for it, and
+               names that match more than one Place should be reported as ambiguous
+        """
+        us = places["crude_us"]
+        new_york = places["new_york_state"]
+        names = ["NY", "10018", "New York", "New York, New York", "Manhattan, KS", "New York State", "Nowhere"]
+
+        (found, ambiguous) = us.lookup_inside_many(names)
+        assert ambiguous == set()
+        for name in names:
+            assert found[name] == us.lookup_inside(name)
+
+        (found, ambiguous) = new_york.lookup_inside_many(["10018", "Poughkeepsie", "Manhattan, KS"])
+        assert found == {
+            "10018": places["zip_10018"],
+            "Poughkeepsie": places["zip_12601"],
+            "Manhattan, KS": None,
+        }
+
+        # If a plain name matches several places inside this one, the name is ambiguous.
+        everywhere = Place.everywhere(db_session)
+        (found, ambiguous) = everywhere.lookup_inside_many(["New York", "US"])
+        assert found == {"US": us}
+        assert ambiguous == {"New York"}
+
     def test_lookup_one_through_external_source(self, places, db_session, create_test_place):
         # We're going to find the approximate location of Poughkeepsie even though the database doesn't have
         # a Place named "Poughkeepsie".
@@ -509,6 +558,65 @@ class TestPlaceModel:
         # Connecticut state library serves New York.
         assert new_york.served_by().all() == [nypl]
 
+    def test__uszipcode_search_engine(self, monkeypatch):
+        """
+        GIVEN: No uszipcode SearchEngine has been created yet
+        WHEN:  Place._uszipcode_search_engine() is called more than once, from more than one thread
+        THEN:  Each thread creates one SearchEngine and gets that same one back on later calls
+        """
+        created = []
+
+        class MockSearchEngine:
+            def __init__(self, **kwargs):
+                created.append(kwargs)
+
+        monkeypatch.setattr("uszipcode.SearchEngine", MockSearchEngine)
+        monkeypatch.setattr(Place, "_uszipcode", threading.local())
+
+        search = Place._uszipcode_search_engine()
+        assert isinstance(search, MockSearchEngine)
+        assert Place._uszipcode_search_engine() is search
+        assert created == [dict(db_file_dir=Configuration.DATADIR, simple_zipcode=True)]
+
+        other_thread = []
+        thread = threading.Thread(target=lambda: other_thread.append(Place._uszipcode_search_engine()))
+        thread.start()
+        thread.join()
+        assert other_thread[0] is not search
+        assert len(created) == 2
+
+    def test__uszipcode_zip_codes(self, monkeypatch):
+        """
+        GIVEN: A uszipcode SearchEngine that knows about one city
+        WHEN:  Place._uszipcode_zip_codes() is called for that city, more than once, and for an unknown city
+        THEN:  The city's ZIP codes are returned, and uszipcode is only asked for them once
+        """
+        lookups = []
+
+        class MockZipcode:
+            def __init__(self, zipcode):
+                self.zipcode = zipcode
+
+        class MockSearchEngine:
+            state_to_city_mapper = {"NY": ["Poughkeepsie"]}
+
+            def by_city_and_state(self, city, state, returns=None):
+                lookups.append((city, state))
+                return [MockZipcode("12601"), MockZipcode("12603")]
+
+        monkeypatch.setattr(Place, "_uszipcode_search_engine", classmethod(lambda cls: MockSearchEngine()))
+        Place._uszipcode_zip_codes.cache_clear()
+        try:
+            assert Place._uszipcode_zip_codes("NY", "Poughkeepsie") == ("12601", "12603")
+            assert Place._uszipcode_zip_codes("NY", "Poughkeepsie") == ("12601", "12603")
+            assert lookups == [("Poughkeepsie", "NY")]
+
+            assert Place._uszipcode_zip_codes("NY", "Springfield") == ()
+            assert Place._uszipcode_zip_codes("ON", "Hamilton") == ()
+            assert len(lookups) == 1
+        finally:
+            Place._uszipcode_zip_codes.cache_clear()
+
 
 class TestPlaceAliasModel:
     """
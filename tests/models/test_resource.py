@@ -282,3 +282,21 @@ class TestValidationModel:
         validation_obj.success = False
         validation_obj.started_at = datetime.utcnow() - timedelta(days=10)
         assert validation_obj.active is False        # Success is false, but expiry has passed
+
+    def test_active_expression(self, db_session, validation_obj):
+        """
+        GIVEN: A Validation object
+        WHEN:  Validations are filtered on Validation.active in a database query
+        THEN:  The Validation should be found only when its .active property is True
+        """
+        def active_in_database():
+            return db_session.query(Validation).filter(Validation.active).all() == [validation_obj]
+
+        assert active_in_database() is True
+
+        validation_obj.success = True
+        assert active_in_database() is False
+
+        validation_obj.success = False
+        validation_obj.started_at = datetime.utcnow() - timedelta(days=10)
+        assert active_in_database() is False
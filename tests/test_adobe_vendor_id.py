@@ -83,6 +83,105 @@ class TestAdobeVendorIdController:
         ...
 
 
+class MockResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf8")
+
+
+class TestAdobeVendorIDClient:
+    @pytest.fixture
+    def mock_requests(self, monkeypatch):
+        """Replace requests.get and requests.post with functions that record each call and return queued responses"""
+        class MockRequests:
+            def __init__(self):
+                self.calls = []
+                self.responses = []
+
+            def _respond(self, url, data=None):
+                self.calls.append((url, data))
+                return self.responses.pop(0)
+
+            get = post = _respond
+
+        mock = MockRequests()
+        monkeypatch.setattr("library_registry.drm.controller.requests", mock)
+        yield mock
+
+    def test_status(self, mock_requests):
+        """
+        GIVEN: A Vendor ID server which responds to a status request with a text/plain 'UP'
+        WHEN:  AdobeVendorIDClient.status() is called
+        THEN:  True should be returned
+        """
+        mock_requests.responses.append(MockResponse(200, "UP"))
+        client = AdobeVendorIDClient("http://server/AdobeAuth/")
+        assert client.status() is True
+        assert mock_requests.calls == [("http://server/AdobeAuth/Status", None)]
+
+    def test_sign_in_authdata(self, mock_requests):
+        """
+        GIVEN: A Vendor ID server which responds to a signin request with a signInResponse document
+        WHEN:  AdobeVendorIDClient.sign_in_authdata() is called
+        THEN:  The user identifier, label, and document should be returned as strings
+        """
+        document = (t.SIGN_IN_RESPONSE_TEMPLATE % {b"user": b"urn:uuid:1", b"label": b"Some label"}).decode("utf8")
+        mock_requests.responses.append(MockResponse(200, document))
+        client = AdobeVendorIDClient("http://server/AdobeAuth/")
+        assert client.sign_in_authdata("a token") == ("urn:uuid:1", "Some label", document)
+
+        [(url, body)] = mock_requests.calls
+        assert url == "http://server/AdobeAuth/SignIn"
+        assert AdobeSignInRequestParser().process(body) == {'method': 'authData', 'authData': 'a token'}
+
+    def test_error_document(self, mock_requests):
+        """
+        GIVEN: A Vendor ID server which responds to a request with an error document
+        WHEN:  AdobeVendorIDClient.user_info() is called
+        THEN:  A VendorIDAuthenticationError should be raised, containing the error code
+        """
+        document = AdobeVendorIDRequestHandler(TEST_VENDOR_ID).error_document("ACCOUNT_INFO", "Nope.").decode("utf8")
+        mock_requests.responses.append(MockResponse(200, document))
+        client = AdobeVendorIDClient("http://server/AdobeAuth/")
+        with pytest.raises(VendorIDAuthenticationError) as exc:
+            client.user_info("urn:uuid:1")
+        assert "E_1045_ACCOUNT_INFO Nope." in str(exc.value)
+
+
+class TestAdobeVendorIdRoutes:
+    @pytest.mark.parametrize(
+        'method,route',
+        [
+            pytest.param('post', '/AdobeAuth/SignIn', id='signin'),
+            pytest.param('post', '/AdobeAuth/AccountInfo', id='accountinfo'),
+            pytest.param('get', '/AdobeAuth/Status', id='status'),
+        ]
+    )
+    def test_routes_without_vendor_id(self, client, method, route):
+        """
+        GIVEN: A registry with no Adobe Vendor ID integration configured
+        WHEN:  One of the Adobe Vendor ID routes is requested
+        THEN:  An empty 404 response should be returned
+        """
+        response = getattr(client, method)(route)
+        assert response.status_code == 404
+        assert response.data == b""
+
+    def test_status_route_with_vendor_id(self, app, client, vendor_id_service):
+        """
+        GIVEN: A registry with an Adobe Vendor ID integration configured
+        WHEN:  The /AdobeAuth/Status route is requested
+        THEN:  A plain text 'UP' response should be returned
+        """
+        app.library_registry.setup_controllers()
+        response = client.get('/AdobeAuth/Status')
+
+        assert response.status_code == 200
+        assert response.data == b"UP"
+        assert response.headers["Content-Type"] == "text/plain"
+
+
 class TestConfiguration:
     @pytest.mark.needsdocstring
     def test_accessor(self, db_session, vendor_id_service):
@@ -167,11 +266,125 @@ class TestVendorIDRequestParsers:
         data = parser.process(accountinfo_request)
         assert data == {'method': 'standard', 'user': merge_data["uuid"]}
 
+    @pytest.mark.parametrize(
+        'parser,document',
+        [
+            pytest.param(
+                AdobeSignInRequestParser(),
+                t.SIGN_IN_REQUEST_TEMPLATE % {"username": "Vendor username", "password": "Vendor password"},
+                id='standard_sign_in'
+            ),
+            pytest.param(
+                AdobeSignInRequestParser(),
+                t.AUTHDATA_SIGN_IN_REQUEST_TEMPLATE % {"authdata": "dGhpcyBkYXRhIHdhcyBiYXNlNjQgZW5jb2RlZA=="},
+                id='authdata_sign_in'
+            ),
+            pytest.param(
+                AdobeAccountInfoRequestParser(),
+                t.ACCOUNT_INFO_REQUEST_TEMPLATE % {"uuid": "urn:uuid:0xxxxxxx-xxxx-1xxx-xxxx-yyyyyyyyyyyy"},
+                id='accountinfo'
+            ),
+            pytest.param(
+                AdobeSignInRequestParser(),
+                t.ACCOUNT_INFO_REQUEST_TEMPLATE % {"uuid": "urn:uuid:0xxxxxxx-xxxx-1xxx-xxxx-yyyyyyyyyyyy"},
+                id='wrong_document_type'
+            ),
+            pytest.param(
+                AdobeSignInRequestParser(),
+                '<signInRequest method="standard" xmlns="http://ns.adobe.com/adept"><username>x</username>'
+                '<other><password>nested</password></other></signInRequest>',
+                id='ignores_nested_tags'
+            ),
+        ]
+    )
+    def test_process_fast_matches_process(self, parser, document):
+        """
+        GIVEN: An Adobe request parser and a request document
+        WHEN:  .process_fast() is called on the document
+        THEN:  The result should be identical to the result of the XPath-based .process()
+        """
+        assert parser.process_fast(document) == parser.process(document)
+
+    @pytest.mark.parametrize(
+        'document,expected',
+        [
+            pytest.param(
+                t.AUTHDATA_SIGN_IN_REQUEST_TEMPLATE % {"authdata": "dGhpcyBkYXRhIHdhcyBiYXNlNjQgZW5jb2RlZA=="},
+                {'authData': 'this data was base64 encoded', 'method': 'authData'},
+                id='canonical_authdata'
+            ),
+            pytest.param(
+                '<signInRequest method="authData" xmlns="http://ns.adobe.com/adept">'
+                '<authData>dGhpcyBkYXRh\nIHdhcyBiYXNlNjQgZW5jb2RlZA==</authData></signInRequest>',
+                {'authData': 'this data was base64 encoded', 'method': 'authData'},
+                id='whitespace_in_token'
+            ),
+            pytest.param(
+                '<signInRequest xmlns="http://ns.adobe.com/adept" method="authData">'
+                '<authData>dGhpcyBkYXRhIHdhcyBiYXNlNjQgZW5jb2RlZA==</authData></signInRequest>',
+                None,
+                id='attributes_reordered'
+            ),
+            pytest.param(
+                '<signInRequest method="authData" xmlns="http://ns.adobe.com/adept">'
+                '<authData>dGhpcyBk&#89;XRh</authData></signInRequest>',
+                None,
+                id='entity_in_token'
+            ),
+            pytest.param(
+                t.SIGN_IN_REQUEST_TEMPLATE % {"username": "user", "password": "pass"},
+                None,
+                id='standard_sign_in'
+            ),
+        ]
+    )
+    def test_process_authdata(self, document, expected):
+        """
+        GIVEN: A signin request document
+        WHEN:  AdobeSignInRequestParser.process_authdata() is called on the document
+        THEN:  A canonical authData document should be decoded without the XML parser, and anything
+               else should return None, to be handled by .process_fast()
+        """
+        parser = AdobeSignInRequestParser()
+        assert parser.process_authdata(document) == expected
+        if expected:
+            assert parser.process_fast(document) == expected
+
+    def test_entities_are_not_expanded(self):
+        """
+        GIVEN: A signin request document with a DTD declaring an entity, and that entity used as the username
+        WHEN:  AdobeSignInRequestParser.process_fast() is called on the document
+        THEN:  The entity should not be expanded, and the result should match .process()
+        """
+        document = (
+            '<!DOCTYPE signInRequest [<!ENTITY name "expanded">]>'
+            '<signInRequest method="standard" xmlns="http://ns.adobe.com/adept">'
+            '<username>&name;</username><password>pass</password></signInRequest>'
+        )
+        parser = AdobeSignInRequestParser()
+        data = parser.process_fast(document)
+        assert data == parser.process(document)
+        assert data['username'] != "expanded"
+        assert data['password'] == "pass"
+
+    def test_process_fast_malformed_document(self):
+        """
+        GIVEN: A request document which is not well-formed XML
+        WHEN:  AdobeSignInRequestParser.process_fast() is called on the document
+        THEN:  The lxml parse error from the XPath-based .process() should be raised
+        """
+        with pytest.raises(Exception) as exc:
+            AdobeSignInRequestParser().process_fast('<signInRequest method="standard"><username>')
+
+        assert exc.typename == 'XMLSyntaxError'
+
 
 class TestVendorIDRequestHandler:
     user1_uuid = "test-uuid"
     user1_label = "Human-readable label for user1"
-    user1_signin_xml_response_body = t.SIGN_IN_RESPONSE_TEMPLATE % {"user": user1_uuid, "label": user1_label}
+    user1_signin_xml_response_body = t.SIGN_IN_RESPONSE_TEMPLATE % {
+        b"user": user1_uuid.encode("utf8"), b"label": user1_label.encode("utf8")
+    }
     username_password_lookup = {("user1", "pass1"): (user1_uuid, user1_label)}
     authdata_lookup = {"The secret token": (user1_uuid, user1_label)}
     userinfo_lookup = {user1_uuid: user1_label}
@@ -201,7 +414,7 @@ class TestVendorIDRequestHandler:
         THEN:
         """
         doc = self._handler.error_document("VENDORID", "Some random error")
-        assert doc == '<error xmlns="http://ns.adobe.com/adept" data="E_1045_VENDORID Some random error"/>'
+        assert doc == b'<error xmlns="http://ns.adobe.com/adept" data="E_1045_VENDORID Some random error"/>'
 
     @pytest.mark.needsdocstring
     def test_handle_username_sign_in_request_success(self):
@@ -234,9 +447,9 @@ class TestVendorIDRequestHandler:
             self._authdata_login
         )
         expected = t.ERROR_RESPONSE_TEMPLATE % {
-            "vendor_id": TEST_VENDOR_ID,
-            "type": "AUTH",
-            "message": "Incorrect barcode or PIN.",
+            b"vendor_id": TEST_VENDOR_ID.encode("utf8"),
+            b"type": b"AUTH",
+            b"message": b"Incorrect barcode or PIN.",
         }
         assert result == expected
 
@@ -265,7 +478,7 @@ class TestVendorIDRequestHandler:
         """
         doc = t.AUTHDATA_SIGN_IN_REQUEST_TEMPLATE % dict(authdata="incorrect")
         result = self._handler.handle_signin_request(doc, self._standard_login, self._authdata_login)
-        assert result.startswith(f'<error xmlns="http://ns.adobe.com/adept" data="E_{TEST_VENDOR_ID}_AUTH')
+        assert result.startswith(f'<error xmlns="http://ns.adobe.com/adept" data="E_{TEST_VENDOR_ID}_AUTH'.encode("utf8"))
 
     @pytest.mark.needsdocstring
     def test_handle_username_authdata_request_failure(self):
@@ -277,9 +490,9 @@ class TestVendorIDRequestHandler:
         doc = t.AUTHDATA_SIGN_IN_REQUEST_TEMPLATE % dict(authdata=base64.b64encode("incorrect"))
         result = self._handler.handle_signin_request(doc, self._standard_login, self._authdata_login)
         expected = t.ERROR_RESPONSE_TEMPLATE % {
-            "vendor_id": TEST_VENDOR_ID,
-            "type": "AUTH",
-            "message": "Incorrect token.",
+            b"vendor_id": TEST_VENDOR_ID.encode("utf8"),
+            b"type": b"AUTH",
+            b"message": b"Incorrect token.",
         }
         assert result == expected
 
@@ -293,9 +506,9 @@ class TestVendorIDRequestHandler:
         doc = t.AUTHDATA_SIGN_IN_REQUEST_TEMPLATE % dict(authdata=base64.b64encode("incorrect"))
         result = self._handler.handle_accountinfo_request(doc, self._userinfo)
         expected = t.ERROR_RESPONSE_TEMPLATE % {
-            "vendor_id": TEST_VENDOR_ID,
-            "type": "ACCOUNT_INFO",
-            "message": "Request document in wrong format.",
+            b"vendor_id": TEST_VENDOR_ID.encode("utf8"),
+            b"type": b"ACCOUNT_INFO",
+            b"message": b"Request document in wrong format.",
         }
         assert result == expected
 
@@ -309,9 +522,9 @@ class TestVendorIDRequestHandler:
         doc = t.ACCOUNT_INFO_REQUEST_TEMPLATE % dict(uuid=self.user1_uuid)
         result = self._handler.handle_signin_request(doc, self._standard_login, self._authdata_login)
         expected = t.ERROR_RESPONSE_TEMPLATE % {
-            "vendor_id": TEST_VENDOR_ID,
-            "type": "AUTH",
-            "message": "Request document in wrong format.",
+            b"vendor_id": TEST_VENDOR_ID.encode("utf8"),
+            b"type": b"AUTH",
+            b"message": b"Request document in wrong format.",
         }
         assert result == expected
 
@@ -324,7 +537,7 @@ class TestVendorIDRequestHandler:
         """
         doc = t.ACCOUNT_INFO_REQUEST_TEMPLATE % dict(uuid=self.user1_uuid)
         result = self._handler.handle_accountinfo_request(doc, self._userinfo)
-        expected = t.ACCOUNT_INFO_RESPONSE_TEMPLATE % {"label": self.user1_label}
+        expected = t.ACCOUNT_INFO_RESPONSE_TEMPLATE % {b"label": self.user1_label.encode("utf8")}
         assert result == expected
 
     @pytest.mark.needsdocstring
@@ -338,9 +551,9 @@ class TestVendorIDRequestHandler:
         doc = t.ACCOUNT_INFO_REQUEST_TEMPLATE % merge_data
         result = self._handler.handle_accountinfo_request(doc, self._userinfo)
         expected = t.ERROR_RESPONSE_TEMPLATE % {
-            "vendor_id": TEST_VENDOR_ID,
-            "type": "ACCOUNT_INFO",
-            "message": f"Could not identify patron from '{merge_data['uuid']}'.",
+            b"vendor_id": TEST_VENDOR_ID.encode("utf8"),
+            b"type": b"ACCOUNT_INFO",
+            b"message": f"Could not identify patron from '{merge_data['uuid']}'.".encode("utf8"),
         }
         assert result == expected
 
@@ -411,6 +624,32 @@ class TestVendorIDModel:
         assert new_account_id == account_id
         assert new_label == label
 
+    def test_short_client_token_lookup_cached(self, db_session, vendor_id_model, vendor_id_model_library):
+        """
+        GIVEN: A valid short client token which has already been looked up once
+        WHEN:  The same token is looked up again, with either authdata_lookup or standard_lookup
+        THEN:  The cached result should be returned without decoding the token again
+        """
+        encoder = ShortClientTokenEncoder()
+        short_client_token = encoder.encode(
+            vendor_id_model_library.short_name,
+            vendor_id_model_library.shared_secret,
+            "patron alias"
+        )
+        result = vendor_id_model.authdata_lookup(short_client_token)
+        assert len(vendor_id_model.lookup_cache) == 1
+
+        def decode_not_allowed(*args, **kwargs):
+            raise AssertionError("The token should not be decoded again.")
+
+        vendor_id_model.short_client_token_decoder.decode = decode_not_allowed
+        vendor_id_model.short_client_token_decoder.decode_two_part = decode_not_allowed
+
+        assert vendor_id_model.authdata_lookup(short_client_token) == result
+
+        token, signature = short_client_token.rsplit('|', 1)
+        assert vendor_id_model.standard_lookup({"username": token, "password": signature}) == result
+
     @pytest.mark.needsdocstring
     def test_short_client_token_lookup_failure(self, vendor_id_model, vendor_id_model_library):
         """
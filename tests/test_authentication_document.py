@@ -3,8 +3,10 @@ from collections import defaultdict
 import pytest
 
 from library_registry.authentication_document import AuthenticationDocument
+from library_registry.config import Configuration
 from library_registry.model import (
     Audience,
+    ConfigurationSetting,
     Place,
     ServiceArea,
 )
@@ -184,6 +186,62 @@ class TestParseCoverage:
         parse_places(["CA", "UT"], expected_places=[ca, ut])
         MockPlace._default_nation = None
 
+    def test_default_nation_is_looked_up_once_per_session(self, db_session, crude_us, monkeypatch):
+        """
+        GIVEN: A registry whose default nation is set
+        WHEN:  AuthenticationDocument._default_nation() is called repeatedly with the same database session
+        THEN:  The default nation should only be looked up the first time
+        """
+        ConfigurationSetting.sitewide(db_session, Configuration.DEFAULT_NATION_ABBREVIATION).value = "US"
+        assert AuthDoc._default_nation(db_session) == crude_us
+
+        def no_lookups(*args, **kwargs):
+            raise AssertionError("The default nation should not be looked up again")
+        monkeypatch.setattr(Place, "default_nation", no_lookups)
+        assert AuthDoc._default_nation(db_session) == crude_us
+
+        # A mock place class is always asked directly.
+        MockPlace._default_nation = crude_us
+        assert AuthDoc._default_nation(db_session, MockPlace) == crude_us
+        MockPlace._default_nation = None
+        assert AuthDoc._default_nation(db_session, MockPlace) is None
+
+        for setting_obj in db_session.query(ConfigurationSetting).all():
+            db_session.delete(setting_obj)
+        db_session.commit()
+
+    def test_resolved_coverage_is_cached(
+        self, db_session, create_test_place, crude_us, new_york_state, monkeypatch
+    ):
+        """
+        GIVEN: A coverage object naming real Places
+        WHEN:  The same coverage object is parsed twice, and then a Place is created
+        THEN:  The second parse should reuse the first result without looking up any names,
+               and creating a Place should throw the cached result away
+        """
+        coverage = {"US": ["NY", "Nowhere"]}
+        (places, unknown, _) = AuthDoc.parse_coverage(db_session, coverage)
+        assert places == [new_york_state]
+        assert unknown == {"US": ["Nowhere"]}
+
+        def no_lookups(*args, **kwargs):
+            raise AssertionError("Cached coverage should not be looked up again")
+        monkeypatch.setattr(Place, "lookup_one_by_name", no_lookups)
+
+        (places, unknown, _) = AuthDoc.parse_coverage(db_session, coverage)
+        assert places == [new_york_state]
+        assert unknown == {"US": ["Nowhere"]}
+
+        place = create_test_place(db_session, external_name="Nowhere", parent=crude_us)
+        monkeypatch.undo()
+
+        (places, unknown, _) = AuthDoc.parse_coverage(db_session, coverage)
+        assert places == [new_york_state, place]
+        assert not unknown
+
+        db_session.delete(place)
+        db_session.commit()
+
 
 class TestLinkExtractor:
     """Test the _extract_link helper method."""
@@ -257,6 +315,19 @@ class TestLinkExtractor:
         assert parsed.logo_link is None
         assert parsed.anonymous_access is False
 
+    def test_oversized_document(self, monkeypatch):
+        """
+        GIVEN: An authentication document larger than AuthenticationDocument.MAX_DOCUMENT_SIZE
+        WHEN:  AuthenticationDocument.from_string() is called on it
+        THEN:  A ValueError should be raised
+        """
+        document = '{"id": "http://library/", "title": "A library"}'
+        monkeypatch.setattr(AuthDoc, "MAX_DOCUMENT_SIZE", len(document) - 1)
+
+        with pytest.raises(ValueError) as exc:
+            AuthDoc.from_string(None, document, MockPlace())
+        assert "Authentication document is too large" in str(exc.value)
+
     @pytest.mark.needsdocstring
     def test_real_document(self):
         """
@@ -373,6 +444,24 @@ class TestLinkExtractor:
         assert auth.logo is None
         assert auth.logo_link == {"href": "http://logo.com/logo.jpg", "rel": "logo"}
 
+    def test_links_with_rel(self):
+        """
+        GIVEN: An authentication document whose links include one with a list of rels
+        WHEN:  links_with_rel() is called
+        THEN:  Every link whose rel is exactly the given rel is returned; a link with a list of rels is not
+        """
+        help_link = dict(rel="help", href="mailto:help@library.org")
+        other_help_link = dict(rel="help", href="mailto:help2@library.org")
+        multi_link = dict(rel=["help", "alternate"], href="mailto:alt@library.org")
+        logo_link = dict(rel="logo", href="http://logo.com/logo.jpg")
+        document = {"links": [help_link, logo_link, multi_link, other_help_link]}
+        auth = AuthDoc.from_dict(None, document, MockPlace())
+        assert auth.links_with_rel("help") == [help_link, other_help_link]
+        assert auth.links_with_rel("alternate") == []
+        assert auth.links_with_rel("start") == []
+        assert auth.has_link("alternate") is False
+        assert auth.extract_link("help") == help_link
+
     @pytest.mark.needsdocstring
     def test_audiences(self):
         """
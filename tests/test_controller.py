@@ -891,6 +891,7 @@ class TestLibraryRegistryController:
 
         # Image request fails.
         http_client.queue_response(500)
+        logo_response = http_client.responses[0]
 
         with app.test_request_context("/", method="POST"):
             flask.request.form = registration_form
@@ -899,6 +900,9 @@ class TestLibraryRegistryController:
             assert response.uri == INVALID_INTEGRATION_DOCUMENT.uri
             assert response.detail == "Could not read logo image http://example.com/broken-logo.png"
 
+        # The streamed logo response was closed, even though it couldn't be read.
+        assert logo_response.closed is True
+
     def test_register_fails_on_unknown_service_area(
         self, app, registration_form, http_client, mock_registry_controller, generate_auth_document
     ):
@@ -1229,7 +1233,7 @@ class TestLibraryRegistryController:
             # because it was generated using techniques designed for
             # cryptography which ignore seed(). But we do know how
             # long it is.
-            expect = 'UDAXIH'
+            expect = 'QAHFTR'
             assert expect == library.short_name
             assert len(library.shared_secret) == 48
 
@@ -1305,6 +1309,7 @@ class TestLibraryRegistryController:
         )
         http_client.queue_response(
             200, content=image_data, media_type="image/png")
+        logo_response = http_client.responses[0]
 
         # So the library re-registers itself, and gets an updated
         # registry entry.
@@ -1337,6 +1342,7 @@ class TestLibraryRegistryController:
             assert library.web_url is None
             encoded_image = base64.b64encode(image_data).decode("utf8")
             assert library.logo == "data:image/png;base64,%s" % encoded_image
+            assert logo_response.closed is True
             # The library's library_stage has been updated to reflect
             # the 'stage' method passed in from the client.
             assert library.library_stage == Library.TESTING_STAGE
@@ -1,4 +1,5 @@
 import quopri
+import smtplib
 from email.mime.text import MIMEText
 
 import pytest
@@ -19,13 +20,17 @@ class TestEmailTemplate:
         template = EmailTemplate("A %(color)s subject", "The subject is %(color)s but the body is %(number)d")
         body = template.body("me@example.com", "you@example.com", color="red", number=22)
 
-        # We always generate a MIME multipart message because that's how we handle non-ASCII characters.
-        for expect in ("Content-Type: multipart/mixed;", "Content-Transfer-Encoding: quoted-printable"):
+        # We always generate a UTF-8, quoted-printable MIME message because that's how we handle
+        # non-ASCII characters.
+        for expect in (
+            "MIME-Version: 1.0",
+            'Content-Type: text/plain; charset="utf-8"',
+            "Content-Transfer-Encoding: quoted-printable",
+        ):
             assert expect in body
 
-        # A MIME multipart message contains a randomly generated component, so we can't check the exact
-        # contents, but we can verify that the email addresses made it into the From: and To: headers,
-        # and that variables were interpolated into the templates.
+        # Verify that the email addresses made it into the From: and To: headers, and that variables
+        # were interpolated into the templates.
         for expect in (
             "From: me@example.com\nTo: you@example.com",
             "Subject: =?utf-8?q?A_red_subject",
@@ -33,6 +38,30 @@ class TestEmailTemplate:
         ):
             assert expect in body
 
+    def test_render(self):
+        """
+        GIVEN: An EmailTemplate
+        WHEN:  .render() is called
+        THEN:  The filled-out subject and body should be returned, with the addresses available to the body
+        """
+        template = EmailTemplate("A %(color)s subject", "From %(from_address)s to %(to_address)s: %(color)s")
+        (subject, payload) = template.render("me@example.com", "you@example.com", color="red")
+        assert subject == "A red subject"
+        assert payload == "From me@example.com to you@example.com: red"
+
+    def test_address_headers(self):
+        """
+        GIVEN: An EmailTemplate
+        WHEN:  .body() is called with a non-ASCII From: header, or a To: header containing a line break
+        THEN:  The non-ASCII header should be encoded, and the line break should be refused
+        """
+        template = EmailTemplate("subject", "body")
+        body = template.body("Biblioth\N{LATIN SMALL LETTER E WITH GRAVE}que <me@example.com>", "you@example.com")
+        assert "From: =?utf-8?q?Biblioth=C3=A8que" in body
+
+        with pytest.raises(ValueError):
+            template.body("me@example.com", "you@example.com\nBcc: someone@example.com")
+
     def test_unicode_quoted_printable(self):
         """
         GIVEN:
@@ -318,3 +347,84 @@ class TestEmailer:
         assert login == ('login', (emailer.smtp_username, emailer.smtp_password), {})
         assert sendmail == ('sendmail', (emailer.from_address, "you@library", "email body"), {})
         assert quit == ("quit", (), {})
+
+    def test__send_email_reuses_connection(self, monkeypatch):
+        """
+        GIVEN: An Emailer with no mock SMTP object passed in
+        WHEN:  Several emails are sent, and the server hangs up between two of them
+        THEN:  A single SMTP connection should be reused until the server hangs up, then replaced
+        """
+        connections = []
+
+        class MockConnection:
+            def __init__(self):
+                self.calls = []
+                self.error = None
+                connections.append(self)
+
+            def __getattr__(self, method):
+                def record(*args):
+                    self.calls.append((method, args))
+                    if method == 'sendmail' and self.error:
+                        raise self.error
+                return record
+
+        monkeypatch.setattr("library_registry.emailer.smtplib.SMTP", MockConnection)
+        emailer = Emailer(
+            smtp_username='user', smtp_password='password', smtp_host='host', smtp_port=587,
+            from_name='Email Sender', from_address='from@library.org', templates={},
+        )
+
+        emailer._send_email("you@library", "body 1")
+        emailer._send_email("you@library", "body 2")
+        [connection] = connections
+        assert [method for (method, _) in connection.calls] == ['connect', 'starttls', 'login', 'sendmail', 'sendmail']
+        assert connection.calls[0] == ('connect', ('host', 587))
+
+        # If the server hangs up, the old connection is closed, a new one is made, and the email goes out on
+        # that one. A 421 reply, which a server sends when it's closing an idle connection, and a socket error
+        # are treated the same way.
+        for error in (
+            smtplib.SMTPServerDisconnected(),
+            smtplib.SMTPSenderRefused(421, b"Timeout exceeded", "from@library.org"),
+            ConnectionResetError(),
+        ):
+            connections[-1].error = error
+            emailer._send_email("you@library", "body 3")
+            [stale, fresh] = connections[-2:]
+            assert stale.calls[-1] == ('close', ())
+            assert fresh.calls[-1] == ('sendmail', ('from@library.org', 'you@library', 'body 3'))
+        assert len(connections) == 4
+
+        # Any other error is passed along without trying again.
+        connections[-1].error = smtplib.SMTPRecipientsRefused({})
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            emailer._send_email("you@library", "body 4")
+        assert len(connections) == 4
+
+    def test__smtp_connection_closed_when_login_fails(self, monkeypatch):
+        """
+        GIVEN: An SMTP server that accepts a connection but refuses the login
+        WHEN:  An Emailer with no mock SMTP object passed in tries to send an email
+        THEN:  The connection should be closed, and the error passed along
+        """
+        calls = []
+
+        class MockConnection:
+            def __getattr__(self, method):
+                def record(*args):
+                    calls.append(method)
+                    if method == 'login':
+                        raise smtplib.SMTPAuthenticationError(535, b"Bad credentials")
+                return record
+
+        monkeypatch.setattr("library_registry.emailer.smtplib.SMTP", MockConnection)
+        emailer = Emailer(
+            smtp_username='user', smtp_password='password', smtp_host='host', smtp_port=587,
+            from_name='Email Sender', from_address='from@library.org', templates={},
+        )
+
+        with pytest.raises(smtplib.SMTPAuthenticationError):
+            emailer._send_email("you@library", "body")
+        assert calls == ['connect', 'starttls', 'login', 'close']
+        assert emailer._smtp is None
@@ -1,6 +1,8 @@
 import json
+from io import BytesIO
 
 import pytest
+from PIL import Image
 
 from library_registry.authentication_document import AuthenticationDocument
 from library_registry.opds import OPDSCatalog
@@ -98,12 +100,43 @@ class TestRegistrar:
         assert LibraryRegistrar.opds_response_links(response, rel) == []
         assert LibraryRegistrar.opds_response_links_to_auth_document(response, auth_url) is False
 
+        # Only the feed's own links count, not the links of its entries.
+        entry_link_feed = (
+            f'<feed xmlns="http://www.w3.org/2005/Atom"><title>A feed</title>'
+            f'<entry><link rel="{rel}" href="{auth_url}"/></entry></feed>'
+        )
+        response = DummyHTTPResponse(200, {"Content-Type": OPDSCatalog.OPDS_1_TYPE}, entry_link_feed.encode("utf8"))
+        assert LibraryRegistrar.opds_response_links(response, rel) == []
+
+        # A feed in UTF-16 can't be ruled out by looking for the rel in the raw bytes, so it's parsed.
+        response = DummyHTTPResponse(200, {"Content-Type": OPDSCatalog.OPDS_1_TYPE}, has_link_feed.encode("utf16"))
+        assert LibraryRegistrar.opds_response_links(response, rel) == [auth_url]
+
+        # A malformed OPDS 1 feed.
+        response = DummyHTTPResponse(200, {"Content-Type": OPDSCatalog.OPDS_1_TYPE}, "Not a real feed")
+        assert LibraryRegistrar.opds_response_links_to_auth_document(response, auth_url) is False
+
         # An OPDS 2 feed that has a link.
         catalog = json.dumps({"links": {rel: {"href": auth_url}}})
         response = DummyHTTPResponse(200, {"Content-Type": OPDSCatalog.OPDS_TYPE}, catalog)
         assert LibraryRegistrar.opds_response_links(response, rel) == [auth_url]
         assert LibraryRegistrar.opds_response_links_to_auth_document(response, auth_url) is True
 
+        # An OPDS 2 feed with a list of links, as the spec requires. A link may have more than one rel.
+        catalog = json.dumps({"links": [
+            {"rel": "self", "href": "http://opds-server/"},
+            {"rel": ["alternate", rel], "href": auth_url},
+        ]})
+        response = DummyHTTPResponse(200, {"Content-Type": OPDSCatalog.OPDS_TYPE}, catalog)
+        assert LibraryRegistrar.opds_response_links(response, rel) == [auth_url]
+
+        # A link in the Link header isn't lost when the OPDS 2 body is parsed.
+        response = DummyHTTPResponse(
+            200, {"Content-Type": OPDSCatalog.OPDS_TYPE},
+            catalog, links={rel: {'url': "http://another-auth-document", 'rel': rel}}
+        )
+        assert LibraryRegistrar.opds_response_links(response, rel) == ["http://another-auth-document", auth_url]
+
         # An OPDS 2 feed that has no link.
         catalog = json.dumps({"links": {}})
         response = DummyHTTPResponse(200, {"Content-Type": OPDSCatalog.OPDS_TYPE}, catalog)
@@ -114,6 +147,13 @@ class TestRegistrar:
         response = DummyHTTPResponse(200, {"Content-Type": OPDSCatalog.OPDS_TYPE}, "Not a real feed")
         assert LibraryRegistrar.opds_response_links_to_auth_document(response, auth_url) is False
 
+        # A Link header that names the authentication document is enough; the body isn't looked at.
+        response = DummyHTTPResponse(
+            200, {"Content-Type": OPDSCatalog.OPDS_TYPE}, "Not a real feed", links={rel: {'url': "auth", 'rel': rel}}
+        )
+        response.url = "http://circmanager.org/catalog"
+        assert LibraryRegistrar.opds_response_links_to_auth_document(response, auth_url) is True
+
         # An Authentication For OPDS document.
         response = DummyHTTPResponse(
             200, {"Content-Type": AuthenticationDocument.MEDIA_TYPE},
@@ -130,6 +170,28 @@ class TestRegistrar:
         assert LibraryRegistrar.opds_response_links(response, rel) == []
         assert LibraryRegistrar.opds_response_links_to_auth_document(response, auth_url) is False
 
+    @pytest.mark.parametrize(
+        "status_code,allow_401",
+        [
+            pytest.param(404, False, id="not_found"),
+            pytest.param(401, False, id="behind_authentication_gateway"),
+        ]
+    )
+    def test__make_request_closes_rejected_response(self, status_code, allow_401):
+        """
+        GIVEN: A streamed response that _make_request() turns into a ProblemDetail
+        WHEN:  LibraryRegistrar._make_request() is called
+        THEN:  The response is closed, so its connection goes back to the pool
+        """
+        response = DummyHTTPResponse(status_code, {}, b"")
+        registrar = LibraryRegistrar(object(), do_get=lambda *args, **kwargs: response)
+
+        result = registrar._make_request(
+            "http://registration/", "http://url/", "%(url)s", "%(url)s", "%(url)s", allow_401=allow_401, stream=True
+        )
+        assert isinstance(result, ProblemDetail)
+        assert response.closed is True
+
     @pytest.mark.needsdocstring
     def test__required_email_address(self):
         """
@@ -178,12 +240,12 @@ class TestRegistrar:
         assert result.title == "a title"
         assert result.detail == "No valid mailto: links found with rel=rel0"
 
-        # Links exist but none are valid and relevant.
+        # Links exist but none are valid.
         links = [
             dict(rel="rel1", href="http://foo/"),
             dict(rel="rel1", href="http://bar/"),
-            dict(rel="rel2", href="mailto:me@library.org"),
-            dict(rel="rel2", href="mailto:me2@library.org"),
+            dict(rel="rel1"),
+            dict(rel="rel1", href=["mailto:me@library.org"]),
         ]
         result = LibraryRegistrar._locate_email_addresses("rel1", links, "a title")
         assert isinstance(result, ProblemDetail)
@@ -192,5 +254,43 @@ class TestRegistrar:
         assert result.detail == "No valid mailto: links found with rel=rel1"
 
         # Multiple links that work.
+        links = [
+            dict(rel="rel2", href="mailto:me@library.org"),
+            dict(rel="rel2", href="mailto:me2@library.org"),
+        ]
         result = LibraryRegistrar._locate_email_addresses("rel2", links, "a title")
         assert result == ["mailto:me@library.org", "mailto:me2@library.org"]
+
+    def test__read_logo(self):
+        """
+        GIVEN: Logo images of various sizes and formats
+        WHEN:  LibraryRegistrar._read_logo() is called on each one
+        THEN:  Small PNGs are passed through untouched, other images are converted to PNG,
+               large images are scaled down, and images too big to be a logo are rejected
+               without being decoded
+        """
+        def image_data(size, format="PNG"):
+            buffer = BytesIO()
+            Image.new("RGB", size).save(buffer, format=format)
+            return buffer.getvalue()
+
+        small_png = image_data((10, 20))
+        assert LibraryRegistrar._read_logo(BytesIO(small_png)) == small_png
+
+        png = LibraryRegistrar._read_logo(BytesIO(image_data((10, 20), "GIF")))
+        image = Image.open(BytesIO(png))
+        assert (image.format, image.size) == ("PNG", (10, 20))
+
+        png = LibraryRegistrar._read_logo(BytesIO(image_data((1024, 256))))
+        image = Image.open(BytesIO(png))
+        assert (image.format, image.size) == ("PNG", (512, 128))
+
+        # A PNG that is damaged after its header is caught, even though it isn't re-encoded.
+        with pytest.raises(Exception):
+            LibraryRegistrar._read_logo(BytesIO(small_png[:-20] + b"x" * 20))
+
+        with pytest.raises(ValueError):
+            LibraryRegistrar._read_logo(BytesIO(image_data((4000, 4000))))
+
+        with pytest.raises(ValueError):
+            LibraryRegistrar._read_logo(BytesIO(b"x" * (LibraryRegistrar.LOGO_MAX_BYTES + 1)))
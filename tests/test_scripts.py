@@ -420,6 +420,71 @@ class TestRegistrationRefreshScript:
         script.run(cmd_args=["--library=Library1"])
         assert script.libraries_called_with == "Library1"
 
+    def test_run_commits_in_batches(self, db_session, create_test_library, monkeypatch):
+        """
+        GIVEN: Several libraries that reregister successfully
+        WHEN:  RegistrationRefreshScript.run() is called
+        THEN:  The session is committed once per COMMIT_EVERY successes, plus once at the end
+        """
+        libraries = [create_test_library(db_session, library_name="Library %d" % i) for i in range(5)]
+
+        class MockRegistrar:
+            def reregister(self, library):
+                return None
+
+        class MockScript(RegistrationRefreshScript):
+            COMMIT_EVERY = 2
+
+            def libraries(self, library_name):
+                return libraries
+
+            @property
+            def registrar(self):
+                return MockRegistrar()
+
+        commits = []
+        monkeypatch.setattr(db_session, "commit", lambda: commits.append(1))
+        MockScript(db_session).run(cmd_args=[])
+        assert len(commits) == 3
+
+    def test_run_rolls_back_failed_library(self, db_session, create_test_library, monkeypatch):
+        """
+        GIVEN: A library that reregisters successfully, one that fails, and one whose reregistration
+               raises an exception
+        WHEN:  RegistrationRefreshScript.run() is called
+        THEN:  The failed libraries' changes are rolled back, and the successful library's changes are
+               committed before the exception propagates
+        """
+        libraries = [create_test_library(db_session, library_name="Library %d" % i) for i in range(3)]
+        [succeeds, fails, raises] = libraries
+
+        class MockRegistrar:
+            def reregister(self, library):
+                library.name = "Changed"
+                if library is fails:
+                    return INVALID_INTEGRATION_DOCUMENT
+                if library is raises:
+                    raise Exception("Kaboom")
+
+        class MockScript(RegistrationRefreshScript):
+            def libraries(self, library_name):
+                return libraries
+
+            @property
+            def registrar(self):
+                return MockRegistrar()
+
+        commits = []
+        monkeypatch.setattr(db_session, "commit", lambda: commits.append(1))
+        with pytest.raises(Exception) as exc:
+            MockScript(db_session).run(cmd_args=[])
+        assert "Kaboom" in str(exc.value)
+
+        assert len(commits) == 1
+        assert succeeds.name == "Changed"
+        assert fails.name == "Library 1"
+        assert raises.name == "Library 2"
+
     @pytest.mark.needsdocstring
     def test_registrar(self, db_session):
         """
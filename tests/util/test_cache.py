@@ -0,0 +1,87 @@
+from library_registry.util.cache import TTLCache
+
+
+class MockTimer:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    def test_get_and_set(self):
+        """
+        GIVEN: An empty TTLCache
+        WHEN:  A value is stored and then looked up
+        THEN:  The stored value should be returned, and the default returned for unknown keys
+        """
+        cache = TTLCache(10, 60)
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+        assert "key" in cache
+        assert cache.get("other") is None
+        assert cache.get("other", "default") == "default"
+        assert len(cache) == 1
+
+    def test_expiry(self):
+        """
+        GIVEN: A TTLCache with a default time-to-live of 60 seconds
+        WHEN:  Entries are stored with and without their own time-to-live, and time passes
+        THEN:  Each entry should expire after the shorter of its own time-to-live and the default
+        """
+        timer = MockTimer()
+        cache = TTLCache(10, 60, timer=timer)
+        cache.set("default", 1)
+        cache.set("short", 2, ttl=10)
+        cache.set("long", 3, ttl=600)
+
+        timer.now += 30
+        assert cache.get("short") is None
+        assert cache.get("default") == 1
+        assert cache.get("long") == 3
+
+        timer.now += 31
+        assert cache.get("default") is None
+        assert cache.get("long") is None
+        assert len(cache) == 0
+
+    def test_already_expired_entry_is_not_stored(self):
+        """
+        GIVEN: A TTLCache
+        WHEN:  An entry is stored with a time-to-live of zero or less
+        THEN:  The entry should not be stored
+        """
+        cache = TTLCache(10, 60)
+        cache.set("key", "value", ttl=0)
+        cache.set("key2", "value", ttl=-5)
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        """
+        GIVEN: A full TTLCache
+        WHEN:  A new entry is stored
+        THEN:  The least recently used entry should be evicted
+        """
+        cache = TTLCache(2, 60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_pop_and_clear(self):
+        """
+        GIVEN: A TTLCache with entries in it
+        WHEN:  .pop() or .clear() is called
+        THEN:  The relevant entries should be removed
+        """
+        cache = TTLCache(10, 60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
+        cache.clear()
+        assert len(cache) == 0
@@ -1,7 +1,9 @@
-import requests
+import http.server
 import json
+import threading
 
 import pytest
+import requests
 
 from library_registry.util.http import (
     HTTP,
@@ -183,6 +185,64 @@ class TestHTTP:
             assert isinstance(v, bytes)
         assert isinstance(data, bytes)
 
+    def test_debuggable_request_uses_shared_session(self, monkeypatch):
+        """Unless told otherwise, debuggable requests go through a single
+        requests.Session, so connections to the same host are reused.
+        """
+        session = HTTP.session()
+        assert isinstance(session, requests.Session)
+        assert HTTP.session() is session
+
+        calls = []
+
+        def request(*args, **kwargs):
+            calls.append(args)
+            return MockRequestsResponse(200, content="Success!")
+
+        monkeypatch.setattr(session, "request", request)
+        HTTP.debuggable_get("http://foo/")
+        HTTP.debuggable_get("http://foo/bar")
+        assert calls == [("GET", "http://foo/"), ("GET", "http://foo/bar")]
+
+        # Another thread gets its own session, which sends its requests through the same connection pool.
+        other_thread_sessions = []
+        thread = threading.Thread(target=lambda: other_thread_sessions.append(HTTP.session()))
+        thread.start()
+        thread.join()
+        [other_session] = other_thread_sessions
+        assert other_session is not session
+        assert other_session.get_adapter("https://foo/") is session.get_adapter("https://foo/")
+
+    def test_debuggable_request_does_not_keep_cookies(self):
+        """A cookie set by one server response isn't sent along with the next request."""
+        cookie_headers = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                cookie_headers.append(self.headers.get("Cookie"))
+                self.send_response(200)
+                self.send_header("Set-Cookie", "session=abc; Path=/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:%d/" % server.server_port
+            HTTP.debuggable_get(url)
+            HTTP.debuggable_get(url)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        assert cookie_headers == [None, None]
+        assert len(HTTP.session().cookies) == 0
+
 
 class TestRemoteIntegrationException:
 